@@ -0,0 +1,101 @@
+"""Death message matching shared by humbler.py and utils/check_death_messages.py.
+
+check_death_messages.py --optimize writes a matcher artifact that humbler.py
+loads, so both build and check it with the code here.
+"""
+import hashlib
+import json
+import os
+import re
+
+# Bumped when the artifact format changes; humbler.py ignores artifacts of other versions
+MATCHER_ARTIFACT_VERSION = 1
+
+
+def matcher_artifact_path(file_path):
+    return os.path.splitext(file_path)[0] + ".matcher.json"
+
+
+def phrases_digest(phrases):
+    """Identify a deathMessages.json phrase list, so a matcher artifact built from another one is not used."""
+    normalized = [phrase.lower() for phrase in phrases if phrase]
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+
+def minimize_patterns(patterns):
+    """Drop every pattern that contains a shorter one.
+
+    Patterns are matched as lowercase substrings, so any line containing
+    "was withered away" also contains "withered away" and the longer pattern
+    can never change whether a line matches. Returns (kept patterns, {removed: covering pattern}).
+    """
+    kept = []
+    removed = {}
+    for phrase in sorted(set(p.lower() for p in patterns if p), key=lambda p: (len(p), p)):
+        covering = next((k for k in kept if k in phrase), None)
+        if covering:
+            removed[phrase] = covering
+        else:
+            kept.append(phrase)
+    return sorted(kept), removed
+
+
+def build_anchors(phrases):
+    """Pick one literal per phrase that every line containing the phrase must also contain.
+
+    The longest word of each phrase is used, and anchors containing another
+    anchor are dropped since the shorter one already lets those lines through.
+    """
+    candidates = set()
+    for phrase in phrases:
+        words = phrase.split()
+        candidates.add(max(words, key=len) if words else phrase)
+    return sorted(
+        anchor for anchor in candidates
+        if not any(other != anchor and other in anchor for other in candidates)
+    )
+
+
+class DeathMatcher:
+    """Match every death message phrase against a log line in a single scan.
+
+    line_filter is the same pattern over bytes, for finding candidate lines
+    in an already lowercased chunk of the log before any of it is decoded.
+    Phrases containing a shorter one are dropped as the optimized artifact
+    does, so a line reports the same phrase whether or not it is loaded.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = minimize_patterns(phrases)[0]
+        self.anchors = build_anchors(self.phrases)
+        alternation = "|".join(
+            f"(?P<p{index}>{re.escape(phrase)})" for index, phrase in enumerate(self.phrases)
+        )
+        self.regex = re.compile(alternation) if self.phrases else None
+        self.line_filter = re.compile(alternation.encode()) if self.phrases else None
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """Load the phrases, anchors and pattern written by utils/check_death_messages.py --optimize.
+
+        The pattern is a prefix trie of the phrases ending in the same named
+        groups, and anchors is empty when the tool found the pre-filter no
+        longer pays for itself.
+        """
+        matcher = cls.__new__(cls)
+        matcher.phrases = artifact["phrases"]
+        matcher.anchors = artifact["anchors"]
+        matcher.regex = re.compile(artifact["pattern"]) if artifact["pattern"] else None
+        matcher.line_filter = re.compile(artifact["pattern"].encode()) if artifact["pattern"] else None
+        return matcher
+
+    def match(self, line):
+        """Return the death message phrase found in the line, or None."""
+        lowered = line.lower()
+        if self.anchors and not any(anchor in lowered for anchor in self.anchors):
+            return None
+
+        found = self.regex.search(lowered) if self.regex else None
+        if not found:
+            return None
+        return self.phrases[int(found.lastgroup[1:])]
@@ -1,26 +1,42 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
+import bisect
+import ctypes
+import ctypes.util
+import glob
+import gzip
+import hashlib
+import heapq
 import json
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 import os
+import queue
 import random
 import re
 import sqlite3
+from stat import S_ISFIFO, S_ISREG, S_ISSOCK
+import struct
+import sys
+import threading
+import time
 
-import aiofiles
-import discord
-from aiohttp import ClientSession
-from discord import app_commands
-from discord.ext import commands
+from aiohttp import ClientError, ClientSession, web
 from dotenv import load_dotenv
 
+from death_matcher import MATCHER_ARTIFACT_VERSION, DeathMatcher, matcher_artifact_path, phrases_digest
+
 # --------------------------------------------------------------------------- #
 #                              ENVIRONMENT SETUP
 # --------------------------------------------------------------------------- #
 
 load_dotenv()
 
+json_log_sources = os.getenv("JSON_LOG_SOURCES")  # Multi-server mode, see load_log_sources()
 minecraft_season = os.getenv("MINECRAFT_SEASON")
-if not minecraft_season or not minecraft_season.isdigit():
+if not json_log_sources and (not minecraft_season or not minecraft_season.isdigit()):
     raise ValueError("MINECRAFT_SEASON environment variable must be a number")
 
 discord_webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
@@ -28,111 +44,1526 @@ json_death_messages = os.getenv("JSON_DEATH_MESSAGES")
 json_user_whitelist = os.getenv("JSON_USER_WHITELIST")
 json_debug_bots = os.getenv("JSON_DEBUG_BOTS")
 json_humbled_responses = os.getenv("JSON_HUMBLED_RESPONSES")
+json_death_templates = os.getenv(
+    "JSON_DEATH_TEMPLATES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "deathTemplates.json")
+)
 log_file_path = os.getenv("LOG_FILE_PATH")
+server_name = os.getenv("SERVER_NAME", "default")
 db_file_path = os.getenv("DB_FILE_PATH", "deaths.db")
+config_check_interval = float(os.getenv("CONFIG_CHECK_INTERVAL", "1"))
+log_watcher_backend = os.getenv("LOG_WATCHER", "auto")  # auto, inotify or poll
+webhook_coalesce_window = float(os.getenv("WEBHOOK_COALESCE_WINDOW", "0.25"))
+checkpoint_interval = float(os.getenv("CHECKPOINT_INTERVAL", "5"))
+dedupe_size = int(os.getenv("DEDUPE_SIZE", "4096"))
+scoreboard_page_size = int(os.getenv("SCOREBOARD_PAGE_SIZE", "10"))
+metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+metrics_port = os.getenv("METRICS_PORT")  # Metrics endpoint is off unless set
+pipeline_queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "1000"))
+shutdown_timeout = float(os.getenv("SHUTDOWN_TIMEOUT", "10"))
+read_chunk_size = int(os.getenv("READ_CHUNK_SIZE", str(1024 * 1024)))
+headless = os.getenv("HEADLESS", "").lower() in ("1", "true", "yes")  # Webhook only, never load discord.py
 
-season_column = f"season_{minecraft_season}"
 debug = False
 
-last_position = 0
-last_inode = 0
-last_size = 0
-processed_lines = set()
+LogSource = namedtuple("LogSource", "name log_file_path season")
+
+
+def load_log_sources():
+    """Return the servers whose logs to follow.
+
+    JSON_LOG_SOURCES points at a list like
+    [{"name": "survival", "log_file": "/srv/survival/logs/latest.log", "season": 7}, ...]
+    where "season" defaults to MINECRAFT_SEASON. Without it humbler follows
+    LOG_FILE_PATH alone, as SERVER_NAME.
+    """
+    if not json_log_sources:
+        return (LogSource(server_name, log_file_path, int(minecraft_season)),)
+
+    with open(json_log_sources, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+
+    sources = []
+    for entry in entries:
+        source_season = str(entry.get("season", minecraft_season or ""))
+        if not source_season.isdigit():
+            raise ValueError(f"Log source {entry.get('name')!r} in {json_log_sources} needs a numeric season")
+        sources.append(LogSource(entry["name"], entry["log_file"], int(source_season)))
+
+    names = [source.name for source in sources]
+    if not sources or len(set(names)) != len(names):
+        raise ValueError(f"{json_log_sources} must list at least one log source, each with a unique name")
+    return tuple(sources)
+
+
+log_sources = load_log_sources()
+default_source = log_sources[0]
+multi_server = len(log_sources) > 1
+
+
+def find_log_source(name=None):
+    """Return the log source with this name, the first one if name is empty, or None."""
+    if not name:
+        return default_source
+    return next((source for source in log_sources if source.name == name), None)
+
+
+def season_label(source):
+    return f"{source.name} Season {source.season}" if multi_server else f"Season {source.season}"
+
+
+# --------------------------------------------------------------------------- #
+#                                  METRICS
+# --------------------------------------------------------------------------- #
+
+class Histogram:
+    """Latency distribution over fixed buckets, plus count, sum and worst case."""
+
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def __str__(self):
+        average = self.sum / self.count if self.count else 0.0
+        return f"n={self.count} avg={average * 1000:.2f}ms max={self.max * 1000:.2f}ms"
+
+
+class Metrics:
+    """Counters, gauges and histograms, rendered in the Prometheus text format.
+
+    Recording is a dictionary update; nothing is formatted until the metrics
+    endpoint is scraped. Gauges are callbacks read at scrape time.
+    """
+
+    def __init__(self):
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name, callback, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = callback
+
+    def histograms_named(self, name):
+        return {labels: histogram for (key, labels), histogram in self.histograms.items() if key == name}
+
+    @staticmethod
+    def _escape(value):
+        """Escape a label value as the Prometheus text format requires."""
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _labels(cls, labels, extra=()):
+        pairs = [f'{key}="{cls._escape(value)}"' for key, value in (*labels, *extra)]
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        samples = {}
+        for (name, labels), value in list(self.counters.items()):
+            samples.setdefault(name, []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), callback in list(self.gauges.items()):
+            samples.setdefault(name, []).append(f"{name}{self._labels(labels)} {callback()}")
+        for (name, labels), histogram in list(self.histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+
+        output = []
+        for name, lines in sorted(samples.items()):
+            kind, text = self.help.get(name, ("untyped", ""))
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("humbler_log_lines_total", "counter", "Log lines read")
+metrics.describe("humbler_deaths_matched_total", "counter", "Log lines matched as deaths of tracked players")
+metrics.describe("humbler_match_seconds", "histogram", "Time to match one batch of new log lines")
+metrics.describe("humbler_db_seconds", "histogram", "Database job latency from submission to result")
+metrics.describe("humbler_db_queue_depth", "gauge", "Database jobs waiting for the database thread")
+metrics.describe("humbler_webhook_seconds", "histogram", "Discord webhook request latency by response status")
+metrics.describe("humbler_webhook_embeds_total", "counter", "Embeds delivered to Discord")
+metrics.describe("humbler_webhook_queue_depth", "gauge", "Embeds waiting to be posted to Discord")
+metrics.describe("humbler_webhook_overflow_total", "counter", "Embeds left in the outbox because the webhook queue was full")
+metrics.describe("humbler_webhook_deferred_total", "counter", "Embeds put back in the outbox after failed deliveries")
+metrics.describe("humbler_webhook_rejected_total", "counter", "Embeds dropped because Discord rejected them")
+metrics.describe("humbler_pipeline_queue_depth", "gauge", "Items waiting between pipeline stages")
+
+
+async def metrics_handler(request):
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+async def serve_metrics():
+    """Serve /metrics for Prometheus when METRICS_PORT is set."""
+    if not metrics_port:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, metrics_host, int(metrics_port)).start()
+    print(f"Serving metrics on http://{metrics_host}:{metrics_port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
 
 
 # --------------------------------------------------------------------------- #
 #                              DATABASE FUNCTIONS
 # --------------------------------------------------------------------------- #
 
-def initialize_database():
-    with sqlite3.connect(db_file_path) as conn:
-        cursor = conn.cursor()
+class Database:
+    """One long-lived SQLite connection owned by a dedicated thread.
+
+    Jobs are functions that take the connection as their first argument and
+    are awaited from the event loop. Write jobs that queue up while a batch is
+    running are committed together in one transaction, each inside its own
+    savepoint so a failing job does not undo the others. The latency of every
+    job, from submission to result, is recorded in the humbler_db_seconds
+    histogram per job name.
+    """
+
+    max_batch_size = 100
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.jobs = queue.SimpleQueue()
+        self.conn = None
+        self.thread = None
+
+    def start(self):
+        self.conn = sqlite3.connect(self.file_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.thread = threading.Thread(target=self._run, name="humbler-db", daemon=True)
+        self.thread.start()
+
+    async def read(self, job, *args):
+        return await self._submit(job, args, False)
+
+    async def write(self, job, *args):
+        return await self._submit(job, args, True)
+
+    def _submit(self, job, args, is_write):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.jobs.put((job, args, is_write, loop, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while batch[-1] is not None and len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is None
+            jobs = [job for job in batch if job is not None]
+            if jobs:
+                self._run_batch(jobs)
+            if stop:
+                break
+
+        self.conn.close()
+
+    def _run_batch(self, jobs):
+        in_transaction = any(is_write for _, _, is_write, _, _, _ in jobs)
+        outcomes = []
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS deaths (
-                username TEXT PRIMARY KEY,
-                death_count INTEGER DEFAULT 0
-            )
-        """)
+        try:
+            if in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            for job, args, _, _, _, _ in jobs:
+                if in_transaction:
+                    self.conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((job(self.conn, *args), None))
+                    if in_transaction:
+                        self.conn.execute("RELEASE job")
+                except Exception as e:
+                    if in_transaction:
+                        self.conn.execute("ROLLBACK TO job")
+                        self.conn.execute("RELEASE job")
+                    outcomes.append((None, e))
+            if in_transaction:
+                self.conn.execute("COMMIT")
+        except Exception as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            outcomes = [(None, e)] * len(jobs)
+
+        finished_at = time.perf_counter()
+        for (job, _, _, loop, future, submitted_at), (result, error) in zip(jobs, outcomes):
+            metrics.observe("humbler_db_seconds", finished_at - submitted_at, operation=job.__name__.lstrip("_"))
+            loop.call_soon_threadsafe(resolve_future, future, result, error)
+
+    def latency_report(self):
+        return "\n".join(
+            f"  {dict(labels)['operation']}: {histogram}"
+            for labels, histogram in sorted(metrics.histograms_named("humbler_db_seconds").items())
+        )
 
-        cursor.execute("PRAGMA table_info(deaths)")
-        existing_columns = [row[1] for row in cursor.fetchall()]
+    def close(self):
+        if self.thread is None:
+            return
+        self.jobs.put(None)
+        self.thread.join()
+        self.thread = None
+        if metrics.histograms_named("humbler_db_seconds"):
+            print(f"Database latency:\n{self.latency_report()}")
 
-        if season_column not in existing_columns:
-            cursor.execute(f"ALTER TABLE deaths ADD COLUMN {season_column} INTEGER DEFAULT 0")
 
-        conn.commit()
+def resolve_future(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+database = Database(db_file_path)
+metrics.gauge("humbler_db_queue_depth", database.jobs.qsize)
+
+
+def create_event_schema(conn):
+    """Create the append-only death log and its per-season aggregate.
+
+    Databases from before the event log kept one `season_N` column per season
+    in `deaths`. Those counts are copied into `season_deaths`, along with any
+    total deaths not attributed to a season (as season 0), and the old table
+    is kept as `deaths_legacy`.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE death_events (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            occurred_at INTEGER NOT NULL,
+            cause TEXT,
+            raw_line TEXT NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_death_events_season_username ON death_events (season, username)")
+    cursor.execute("CREATE INDEX idx_death_events_username_time ON death_events (username, occurred_at)")
+    cursor.execute("CREATE INDEX idx_death_events_occurred_at ON death_events (occurred_at)")
+
+    cursor.execute("""
+        CREATE TABLE season_deaths (
+            season INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            deaths INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (season, username)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX idx_season_deaths_leaderboard ON season_deaths (season, deaths DESC)")
+    cursor.execute("CREATE INDEX idx_season_deaths_username ON season_deaths (username)")
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'deaths'")
+    if not cursor.fetchone():
+        return
 
+    cursor.execute("PRAGMA table_info(deaths)")
+    season_columns = [
+        row[1] for row in cursor.fetchall()
+        if re.fullmatch(r"season_\d+", row[1])
+    ]
 
-async def increment_death_count(username):
-    with sqlite3.connect(db_file_path) as conn:
-        cursor = conn.cursor()
+    for column in season_columns:
         cursor.execute(f"""
-            INSERT INTO deaths (username, death_count, {season_column})
-            VALUES (?, 1, 1)
-            ON CONFLICT(username) DO UPDATE SET
-                death_count = death_count + 1,
-                {season_column} = {season_column} + 1
-        """, (username,))
-        cursor.execute(f"SELECT death_count, {season_column} FROM deaths WHERE username = ?", (username,))
-        return cursor.fetchone()
-
-
-async def get_death_count(username):
-    with sqlite3.connect(db_file_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT {season_column} FROM deaths WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        return result[0] if result else 0
-
-
-async def get_scoreboard():
-    with sqlite3.connect(db_file_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT username, {season_column} FROM deaths ORDER BY {season_column} DESC")
-        scoreboard = cursor.fetchall()
-
-    debug_bots = await load_debug_bots()
-    debug_bot_names = {normalize_username(name) for name in debug_bots}
-
-    filtered_scoreboard = [
-        (username, deaths)
-        for username, deaths in scoreboard
-        if normalize_username(username) not in debug_bot_names
-    ]
+            INSERT INTO season_deaths (season, username, deaths)
+            SELECT ?, username, {column} FROM deaths WHERE {column} > 0
+        """, (int(column.split("_")[1]),))
+
+    unattributed = " - ".join(["death_count"] + [f"COALESCE({column}, 0)" for column in season_columns])
+    cursor.execute(f"""
+        INSERT INTO season_deaths (season, username, deaths)
+        SELECT 0, username, {unattributed} FROM deaths WHERE {unattributed} > 0
+    """)
+
+    cursor.execute("ALTER TABLE deaths RENAME TO deaths_legacy")
+
+
+def create_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE log_checkpoints (
+            source TEXT PRIMARY KEY,
+            inode INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            line_length INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL
+        )
+    """)
+
+
+def create_event_dedupe_index(conn):
+    """Make (occurred_at, raw_line) unique so a death read twice is only stored once."""
+    conn.execute("""
+        DELETE FROM death_events WHERE id NOT IN (
+            SELECT MIN(id) FROM death_events GROUP BY occurred_at, raw_line
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX idx_death_events_dedupe ON death_events (occurred_at, raw_line)")
+
+
+def add_death_details(conn):
+    """Add the cause key, killer and item parsed from each death message, filling them in for existing deaths.
+
+    They are left NULL if deathTemplates.json can't be read (see get_death_parser).
+    """
+    for column in DEATH_DETAIL_COLUMNS.values():
+        conn.execute(f"ALTER TABLE death_events ADD COLUMN {column} TEXT")
+        conn.execute(f"CREATE INDEX idx_death_events_season_{column} ON death_events (season, {column})")
+
+    death_parser = get_death_parser()
+    details = []
+    for event_id, raw_line in conn.execute("SELECT id, raw_line FROM death_events").fetchall():
+        event = death_parser.parse(transform_line(raw_line))
+        if event:
+            details.append((event.cause, event.killer, event.item, event_id))
+    conn.executemany("UPDATE death_events SET cause_key = ?, killer = ?, item = ? WHERE id = ?", details)
+
+
+def add_server_column(conn):
+    """Key deaths by server as well as season; existing deaths belong to the first log source."""
+    conn.execute("ALTER TABLE death_events ADD COLUMN server TEXT NOT NULL DEFAULT ''")
+    conn.execute("UPDATE death_events SET server = ?", (default_source.name,))
+
+    conn.execute("DROP INDEX idx_death_events_season_username")
+    conn.execute("CREATE INDEX idx_death_events_server_season_username ON death_events (server, season, username)")
+    for column in DEATH_DETAIL_COLUMNS.values():
+        conn.execute(f"DROP INDEX idx_death_events_season_{column}")
+        conn.execute(f"CREATE INDEX idx_death_events_server_season_{column} ON death_events (server, season, {column})")
+    conn.execute("DROP INDEX idx_death_events_dedupe")
+    conn.execute("CREATE UNIQUE INDEX idx_death_events_dedupe ON death_events (server, occurred_at, raw_line)")
+
+    conn.execute("""
+        CREATE TABLE season_deaths_by_server (
+            server TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            deaths INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (server, season, username)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO season_deaths_by_server (server, season, username, deaths)
+        SELECT ?, season, username, deaths FROM season_deaths
+    """, (default_source.name,))
+    conn.execute("DROP TABLE season_deaths")
+    conn.execute("ALTER TABLE season_deaths_by_server RENAME TO season_deaths")
+    conn.execute("CREATE INDEX idx_season_deaths_leaderboard ON season_deaths (server, season, deaths DESC)")
+    conn.execute("CREATE INDEX idx_season_deaths_username ON season_deaths (server, username)")
+
+
+def create_webhook_outbox(conn):
+    """Webhook messages not yet delivered, written in the same transaction as their death."""
+    conn.execute("""
+        CREATE TABLE webhook_outbox (
+            id INTEGER PRIMARY KEY,
+            embed TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL
+        )
+    """)
+
+
+def create_death_stats(conn):
+    """Create the per-player death buckets and streaks behind /humbler stats, filled in from past deaths."""
+    conn.execute("""
+        CREATE TABLE death_buckets (
+            server TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            deaths INTEGER NOT NULL,
+            PRIMARY KEY (server, season, username, period, bucket_start)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE death_streaks (
+            server TEXT NOT NULL,
+            season INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            last_death_at INTEGER NOT NULL,
+            best_streak INTEGER NOT NULL,
+            best_streak_ended_at INTEGER,
+            deadliest_day INTEGER NOT NULL,
+            deadliest_day_deaths INTEGER NOT NULL,
+            PRIMARY KEY (server, season, username)
+        ) WITHOUT ROWID
+    """)
+    _rebuild_death_stats(conn)
+
+
+def add_minute_buckets(conn):
+    """Replay the death history so recent deaths get the minute buckets counted since this version."""
+    _rebuild_death_stats(conn)
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    create_event_schema,
+    create_checkpoint_table,
+    create_event_dedupe_index,
+    add_death_details,
+    add_server_column,
+    create_webhook_outbox,
+    create_death_stats,
+    add_minute_buckets,
+]
+
+
+def initialize_database(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        print(f"Migrating database to version {number} ({migration.__name__})")
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {number}")
+
+
+DeathRow = namedtuple("DeathRow", "server season username occurred_at cause cause_key killer item raw_line")
+
+INSERT_DEATH_EVENT = """
+    INSERT OR IGNORE INTO death_events (server, season, username, occurred_at, cause, cause_key, killer, item, raw_line)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# /humbler top categories and the indexed death_events column each one counts
+DEATH_DETAIL_COLUMNS = {"causes": "cause_key", "killers": "killer", "weapons": "item"}
+
+
+DeathStats = namedtuple(
+    "DeathStats",
+    "season_deaths last_hour last_day last_death_at best_streak best_streak_ended_at deadliest_day deadliest_day_deaths",
+)
+
+# How long minute and hour buckets are kept; deaths in the last hour and day
+# only need the last 25 hours of them, older ones are pruned as deaths come in
+BUCKET_RETENTION = {"minute": 25 * 3600, "hour": 2 * 86400}
+
+OutboxEntry = namedtuple("OutboxEntry", "id embed")
+
+
+def _increment_death_count(conn, death, build_embed):
+    """Record a DeathRow and queue its announcement in the outbox.
+
+    build_embed(total deaths, season deaths) returns the webhook embed.
+    Returns (total deaths on its server, season deaths, OutboxEntry), with no
+    entry if the death was already recorded.
+    """
+    key = (death.server, death.season, death.username)
+    cursor = conn.cursor()
+    cursor.execute(INSERT_DEATH_EVENT, death)
+    inserted = cursor.rowcount == 1
+
+    if inserted:
+        cursor.execute("""
+            INSERT INTO season_deaths (server, season, username, deaths)
+            VALUES (?, ?, ?, 1)
+            ON CONFLICT(server, season, username) DO UPDATE SET deaths = deaths + 1
+        """, key)
+    cursor.execute("SELECT deaths FROM season_deaths WHERE server = ? AND season = ? AND username = ?", key)
+    result = cursor.fetchone()
+    season_count = result[0] if result else 0
+    cursor.execute(
+        "SELECT SUM(deaths) FROM season_deaths WHERE server = ? AND username = ?", (death.server, death.username)
+    )
+    death_count = cursor.fetchone()[0] or 0
+    if not inserted:
+        return death_count, season_count, None
+
+    _record_death_stats(cursor, death.server, death.season, death.username, death.occurred_at)
+
+    embed = build_embed(death_count, season_count)
+    cursor.execute(
+        "INSERT INTO webhook_outbox (embed, next_attempt_at) VALUES (?, ?)",
+        (json.dumps(embed), time.time()),
+    )
+    return death_count, season_count, OutboxEntry(cursor.lastrowid, embed)
+
+
+def _load_outbox(conn, due_by, limit):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, embed FROM webhook_outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT ?
+    """, (due_by, limit))
+    return [OutboxEntry(entry_id, json.loads(embed)) for entry_id, embed in cursor.fetchall()]
+
+
+def _delete_outbox(conn, entry_ids):
+    conn.executemany("DELETE FROM webhook_outbox WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+
+def _defer_outbox(conn, entry_ids, now):
+    """Push failed entries back with exponential backoff: 30s, 1m, 2m, ... up to an hour."""
+    conn.executemany("""
+        UPDATE webhook_outbox
+        SET attempts = attempts + 1, next_attempt_at = ? + MIN(3600, 30 * (1 << MIN(attempts, 7)))
+        WHERE id = ?
+    """, [(now, entry_id) for entry_id in entry_ids])
+
+
+def bucket_starts(occurred_at):
+    """Return the start of the minute, the hour and the local day a death happened in."""
+    day = datetime.fromtimestamp(occurred_at).replace(hour=0, minute=0, second=0, microsecond=0)
+    return occurred_at - occurred_at % 60, occurred_at - occurred_at % 3600, int(day.timestamp())
+
+
+def _record_death_stats(cursor, server, season, username, occurred_at):
+    """Count a death in its minute, hour and day buckets and update the player's streaks.
+
+    Deaths have to be recorded in time order; backfill adds older ones, so it
+    rebuilds the season with _rebuild_death_stats instead.
+    """
+    key = (server, season, username)
+    minute_start, hour_start, day_start = bucket_starts(occurred_at)
+    cursor.executemany("""
+        INSERT INTO death_buckets (server, season, username, period, bucket_start, deaths)
+        VALUES (?, ?, ?, ?, ?, 1)
+        ON CONFLICT(server, season, username, period, bucket_start) DO UPDATE SET deaths = deaths + 1
+    """, [(*key, "minute", minute_start), (*key, "hour", hour_start), (*key, "day", day_start)])
+    cursor.executemany("""
+        DELETE FROM death_buckets
+        WHERE server = ? AND season = ? AND username = ? AND period = ? AND bucket_start < ?
+    """, [(*key, period, occurred_at - retention) for period, retention in BUCKET_RETENTION.items()])
+    cursor.execute("""
+        SELECT deaths FROM death_buckets
+        WHERE server = ? AND season = ? AND username = ? AND period = 'day' AND bucket_start = ?
+    """, (*key, day_start))
+    day_deaths = cursor.fetchone()[0]
+
+    # Every expression in the DO UPDATE sees the row as it was before this death
+    cursor.execute("""
+        INSERT INTO death_streaks (
+            server, season, username, last_death_at, best_streak, best_streak_ended_at,
+            deadliest_day, deadliest_day_deaths
+        )
+        VALUES (?, ?, ?, ?, 0, NULL, ?, ?)
+        ON CONFLICT(server, season, username) DO UPDATE SET
+            best_streak = MAX(best_streak, excluded.last_death_at - last_death_at),
+            best_streak_ended_at = CASE
+                WHEN excluded.last_death_at - last_death_at > best_streak THEN excluded.last_death_at
+                ELSE best_streak_ended_at
+            END,
+            last_death_at = MAX(last_death_at, excluded.last_death_at),
+            deadliest_day = CASE
+                WHEN excluded.deadliest_day_deaths > deadliest_day_deaths THEN excluded.deadliest_day
+                ELSE deadliest_day
+            END,
+            deadliest_day_deaths = MAX(deadliest_day_deaths, excluded.deadliest_day_deaths)
+    """, (*key, occurred_at, day_start, day_deaths))
+
+
+def _rebuild_death_stats(conn, server=None, season=None):
+    """Recompute death_buckets and death_streaks by replaying death_events in time order.
+
+    Rebuilds one server's season, or everything when no server is given.
+    """
+    condition, params = "1", ()
+    if server is not None:
+        condition, params = "server = ? AND season = ?", (server, season)
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM death_buckets WHERE {condition}", params)
+    cursor.execute(f"DELETE FROM death_streaks WHERE {condition}", params)
+
+    events = conn.execute(f"""
+        SELECT server, season, username, occurred_at FROM death_events
+        WHERE {condition} ORDER BY server, season, username, occurred_at
+    """, params)
+    for event in events:
+        _record_death_stats(cursor, *event)
+
+
+def _store_backfilled_deaths(conn, deaths):
+    """Insert a batch of DeathRows; returns how many were new."""
+    cursor = conn.cursor()
+    added = Counter()
+    for death in deaths:
+        cursor.execute(INSERT_DEATH_EVENT, death)
+        if cursor.rowcount == 1:
+            added[death.server, death.season, death.username] += 1
+
+    cursor.executemany("""
+        INSERT INTO season_deaths (server, season, username, deaths)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(server, season, username) DO UPDATE SET deaths = deaths + excluded.deaths
+    """, [(*key, count) for key, count in added.items()])
+    return sum(added.values())
+
+
+def _get_death_count(conn, server, season, username):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT deaths FROM season_deaths WHERE server = ? AND season = ? AND username = ?", (server, season, username)
+    )
+    result = cursor.fetchone()
+    return result[0] if result else 0
+
+
+def _get_scoreboard(conn, server, season):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT username, deaths FROM season_deaths WHERE server = ? AND season = ? ORDER BY deaths DESC
+    """, (server, season))
+    return cursor.fetchall()
+
+
+def _get_top_details(conn, server, season, column, limit):
+    """Return the most common (value, deaths) of a death_events detail column in a season."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {column}, COUNT(*) FROM death_events
+        WHERE server = ? AND season = ? AND {column} IS NOT NULL
+        GROUP BY {column} ORDER BY COUNT(*) DESC, {column} LIMIT ?
+    """, (server, season, limit))
+    return cursor.fetchall()
+
+
+def _sum_buckets(cursor, key, period, start_after, start_before=2 ** 62):
+    cursor.execute("""
+        SELECT COALESCE(SUM(deaths), 0) FROM death_buckets
+        WHERE server = ? AND season = ? AND username = ? AND period = ? AND bucket_start > ? AND bucket_start < ?
+    """, (*key, period, start_after, start_before))
+    return cursor.fetchone()[0]
+
+
+def recent_deaths(cursor, key, now, window):
+    """Count a player's deaths in the last `window` seconds (a whole number of hours) from their buckets.
+
+    Whole hours inside the window come from hour buckets and the rest from
+    minute buckets. The oldest minute bucket is counted in full, so a death up
+    to a minute before the window may be included, but none inside it is missed.
+    """
+    since = now - window
+    first_hour = -(-since // 3600) * 3600
+    return (
+        _sum_buckets(cursor, key, "hour", first_hour - 1, now - now % 3600)
+        + _sum_buckets(cursor, key, "minute", since - 60, first_hour)
+        + _sum_buckets(cursor, key, "minute", now - now % 3600 - 1)
+    )
+
+
+def _get_death_stats(conn, server, season, username, now):
+    """Return a player's DeathStats for a season, or None if they haven't died in it.
+
+    Reads one season_deaths row, one death_streaks row and at most 24 hour
+    and 120 minute buckets, however long the history is. Deaths counted before
+    the event log (migrated from the old season_N columns) have no times, so a
+    player with only those gets their count and None for the time-based fields.
+    """
+    key = (server, season, username)
+    season_deaths = _get_death_count(conn, *key)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT last_death_at, best_streak, best_streak_ended_at, deadliest_day, deadliest_day_deaths
+        FROM death_streaks WHERE server = ? AND season = ? AND username = ?
+    """, key)
+    streaks = cursor.fetchone()
+    if not streaks:
+        return DeathStats(season_deaths, 0, 0, None, None, None, None, None) if season_deaths else None
+
+    return DeathStats(
+        season_deaths,
+        recent_deaths(cursor, key, now, 3600),
+        recent_deaths(cursor, key, now, 86400),
+        *streaks,
+    )
+
+
+def _get_usernames(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT username FROM season_deaths")
+    return [row[0] for row in cursor.fetchall()]
+
+
+Checkpoint = namedtuple("Checkpoint", "inode position line_length fingerprint")
+
+
+def _load_checkpoint(conn, source):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT inode, position, line_length, fingerprint FROM log_checkpoints WHERE source = ?
+    """, (source,))
+    result = cursor.fetchone()
+    return Checkpoint(*result) if result else None
+
+
+def _save_checkpoint(conn, source, checkpoint):
+    conn.execute("""
+        INSERT INTO log_checkpoints (source, inode, position, line_length, fingerprint)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET
+            inode = excluded.inode,
+            position = excluded.position,
+            line_length = excluded.line_length,
+            fingerprint = excluded.fingerprint
+    """, (source, *checkpoint))
+
+
+async def increment_death_count(matched, build_embed):
+    source = matched.source
+    death_count, season_count, outbox_entry = await database.write(
+        _increment_death_count,
+        death_row(matched, source.name, source.season, matched.occurred_at or line_timestamp(matched.line)),
+        build_embed,
+    )
+    leaderboards[source.name].update(matched.username, season_count)
+    player_names.add(matched.username)
+    return death_count, season_count, outbox_entry
+
+
+async def get_death_count(source, username):
+    return await database.read(_get_death_count, source.name, source.season, username)
+
+
+async def get_top_details(source, category, limit=10):
+    return await database.read(_get_top_details, source.name, source.season, DEATH_DETAIL_COLUMNS[category], limit)
+
+
+async def get_death_stats(source, username):
+    return await database.read(_get_death_stats, source.name, source.season, username, int(time.time()))
+
+
+async def load_leaderboard():
+    for source in log_sources:
+        leaderboards[source.name].load(await database.read(_get_scoreboard, source.name, source.season))
+    player_names.load(await database.read(_get_usernames))
+
+
+# --------------------------------------------------------------------------- #
+#                              LEADERBOARD
+# --------------------------------------------------------------------------- #
+
+class Leaderboard:
+    """One server's current season death counts, kept sorted in memory.
+
+    Loaded from the database once at startup and then updated with each new
+    count as deaths are recorded. Debug bots are left out of the ranking; it
+    is rebuilt only when the debug bot list changes.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.ranking = []
+        self.excluded = None
+
+    @staticmethod
+    def _key(username, deaths):
+        return -deaths, username.lower(), username
+
+    def load(self, rows):
+        self.counts = dict(rows)
+        self.excluded = None
+        self._refresh_exclusions()
+
+    def _refresh_exclusions(self):
+        debug_bot_names = get_debug_bot_names()
+        if debug_bot_names is self.excluded:
+            return
+        self.excluded = debug_bot_names
+        self.ranking = sorted(
+            self._key(username, deaths)
+            for username, deaths in self.counts.items()
+            if normalize_username(username) not in debug_bot_names
+        )
+
+    def update(self, username, deaths):
+        previous = self.counts.get(username)
+        self.counts[username] = deaths
+        if self.excluded is None or normalize_username(username) in self.excluded:
+            return
+        if previous is not None:
+            index = bisect.bisect_left(self.ranking, self._key(username, previous))
+            if index < len(self.ranking) and self.ranking[index][2] == username:
+                del self.ranking[index]
+        bisect.insort(self.ranking, self._key(username, deaths))
+
+    def page_count(self, page_size):
+        self._refresh_exclusions()
+        return max(1, -(-len(self.ranking) // page_size))
 
-    return filtered_scoreboard
+    def page(self, number, page_size):
+        """Return [(rank, username, deaths)] for a zero-based page number."""
+        self._refresh_exclusions()
+        start = number * page_size
+        return [
+            (rank, username, -negative_deaths)
+            for rank, (negative_deaths, _, username) in enumerate(self.ranking[start:start + page_size], start + 1)
+        ]
+
+
+leaderboards = {source.name: Leaderboard() for source in log_sources}
+
+
+# --------------------------------------------------------------------------- #
+#                              PLAYER NAME INDEX
+# --------------------------------------------------------------------------- #
+
+class PlayerNameIndex:
+    """Autocomplete index over whitelisted players and everyone who has died.
+
+    Names are kept in a sorted list for prefix lookups and in an n-gram
+    (1 to 3 characters) map for substring lookups. Usernames from the
+    database are added as deaths are recorded; the whitelist part is rebuilt
+    when the cached whitelist changes.
+    """
+
+    max_gram = 3
+
+    def __init__(self):
+        self.db_names = {}
+        self.whitelist = None
+        self.names = {}
+        self.sorted_names = []
+        self.grams = {}
+
+    def load(self, usernames):
+        self.db_names = {username.lower(): username for username in usernames}
+        self.whitelist = None
+        self._refresh()
+
+    def add(self, username):
+        lowered = username.lower()
+        if lowered in self.db_names:
+            return
+        self.db_names[lowered] = username
+        if lowered not in self.names:
+            self._insert(lowered, username)
+
+    def _refresh(self):
+        try:
+            whitelist = get_whitelist_players()
+        except Exception as e:
+            if self.whitelist is not None:
+                return
+            print(f"⚠️  Error loading whitelist: {e}")
+            whitelist = ()
+        if whitelist is self.whitelist:
+            return
+
+        self.whitelist = whitelist
+        self.names, self.sorted_names, self.grams = {}, [], {}
+        for lowered, username in self.db_names.items():
+            self._insert(lowered, username)
+        for username in whitelist:
+            self._insert(username.lower(), username)  # Whitelist spelling wins
+
+    def _insert(self, lowered, username):
+        if lowered not in self.names:
+            bisect.insort(self.sorted_names, lowered)
+            for size in range(1, self.max_gram + 1):
+                for start in range(len(lowered) - size + 1):
+                    self.grams.setdefault(lowered[start:start + size], set()).add(lowered)
+        self.names[lowered] = username
+
+    def _containing(self, query):
+        if len(query) <= self.max_gram:
+            return self.grams.get(query, set())
+        # Only the rarest n-gram's names need checking
+        candidates = min(
+            (self.grams.get(query[start:start + self.max_gram], set())
+             for start in range(len(query) - self.max_gram + 1)),
+            key=len,
+        )
+        return {lowered for lowered in candidates if query in lowered}
+
+    def search(self, text, limit=25):
+        """Return up to `limit` names containing text, prefix matches first, then by season deaths on any server."""
+        self._refresh()
+        query = text.lower()
+        candidates = self._containing(query) if query else self.sorted_names
+
+        def rank(lowered):
+            username = self.names[lowered]
+            deaths = sum(board.counts.get(username, 0) for board in leaderboards.values())
+            return not lowered.startswith(query), -deaths, lowered
+
+        return [self.names[lowered] for lowered in heapq.nsmallest(limit, candidates, key=rank)]
+
+
+player_names = PlayerNameIndex()
 
 
 # --------------------------------------------------------------------------- #
 #                              JSON / FILE HELPERS
 # --------------------------------------------------------------------------- #
 
-async def read_json_file(file_path):
-    async with aiofiles.open(file_path, "r") as file:
-        content = await file.read()
-    return json.loads(content)
+def read_json_file(file_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_death_messages(file_path):
+    """Build the DeathMatcher, from the optimized artifact next to the file if it is up to date.
+
+    utils/check_death_messages.py --optimize writes deathMessages.matcher.json;
+    it is ignored if it was built from a different list of phrases or by an
+    incompatible version of the tool.
+    """
+    phrases = read_json_file(file_path).get("deathMessages", [])
+    artifact_path = matcher_artifact_path(file_path)
+    if not os.path.exists(artifact_path):
+        return DeathMatcher(phrases)
+
+    artifact = read_json_file(artifact_path)
+    if artifact.get("version") != MATCHER_ARTIFACT_VERSION:
+        reason = f"it is version {artifact.get('version')} and this humbler reads version {MATCHER_ARTIFACT_VERSION}"
+    elif artifact.get("source_digest") != phrases_digest(phrases):
+        reason = f"{os.path.basename(file_path)} has changed since it was built"
+    else:
+        return DeathMatcher.from_artifact(artifact)
+    print(f"Ignoring {artifact_path}, {reason}; rerun utils/check_death_messages.py --optimize")
+    return DeathMatcher(phrases)
+
+
+def load_death_templates(file_path):
+    data = read_json_file(file_path)
+    return DeathParser(data.get("deathTemplates", {}))
 
 
-async def load_death_messages():
-    data = await read_json_file(json_death_messages)
-    return [re.escape(msg) for msg in data.get("deathMessages", [])]
+def load_humbled_responses(file_path):
+    data = read_json_file(file_path)
+    return tuple(response.strip() for response in data.get("humbledResponses", []))
 
 
-async def load_humbled_responses():
-    data = await read_json_file(json_humbled_responses)
-    humbled_responses = data.get("humbledResponses", [])
-    return random.choice(humbled_responses)
+def load_user_whitelist(file_path):
+    data = read_json_file(file_path)
+    return frozenset(normalize_username(user.get("name", "")) for user in data)
 
 
-async def load_user_whitelist():
-    data = await read_json_file(json_user_whitelist)
-    return [re.escape(user.get("name", "")) for user in data]
+def load_whitelist_players(file_path):
+    data = read_json_file(file_path)
+    return tuple(entry.get("name", "") for entry in data if "name" in entry)
 
 
-async def load_debug_bots():
-    data = await read_json_file(json_debug_bots)
-    return [re.escape(user.get("name", "")) for user in data]
+def load_debug_bots(file_path):
+    data = read_json_file(file_path)
+    return frozenset(normalize_username(user.get("name", "")) for user in data)
+
+
+CacheEntry = namedtuple("CacheEntry", "signature checked_at value")
+
+
+class ConfigCache:
+    """Parsed config files, reloaded only when the file on disk changes.
+
+    Each entry is keyed by (file path, loader) and holds the loader's result.
+    The file is stat'ed at most once per check interval; a new result is only
+    built when its inode, mtime or size changed, and replaces the old entry in
+    a single assignment so readers never see a half-built value. If a reload
+    fails, the last good value keeps being served until the file changes again.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._entries = {}
+
+    def get(self, file_path, loader):
+        key = (file_path, loader)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry and now - entry.checked_at < self.check_interval:
+            return entry.value
+
+        signature = entry.signature if entry else None
+        try:
+            stat = os.stat(file_path)
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if entry and entry.signature == signature:
+                self._entries[key] = entry._replace(checked_at=now)
+                return entry.value
+            value = loader(file_path)
+        except (OSError, ValueError) as e:
+            if not entry:
+                raise
+            # Remember the broken version so it is only reported once
+            print(f"Error reloading {file_path}, keeping previous version: {e}")
+            self._entries[key] = entry._replace(signature=signature, checked_at=now)
+            return entry.value
+
+        self._entries[key] = CacheEntry(signature, now, value)
+        return value
+
+
+config_cache = ConfigCache(config_check_interval)
+
+
+def get_death_matcher():
+    return config_cache.get(json_death_messages, load_death_messages)
+
+
+death_templates_missing = False
+
+
+def get_death_parser():
+    """Return the DeathParser, or one that parses nothing while the templates file can't be read.
+
+    Deaths are still recorded without it, just with no cause key, killer or item.
+    """
+    global death_templates_missing
+    try:
+        death_parser = config_cache.get(json_death_templates, load_death_templates)
+    except OSError as e:
+        if not death_templates_missing:
+            print(f"Warning: death causes, killers and weapons won't be recorded: {e}")
+            death_templates_missing = True
+        return DeathParser({})
+    death_templates_missing = False
+    return death_parser
+
+
+def get_humbled_response():
+    return random.choice(config_cache.get(json_humbled_responses, load_humbled_responses))
+
+
+def get_whitelist_names():
+    return config_cache.get(json_user_whitelist, load_user_whitelist)
+
+
+def get_whitelist_players():
+    return config_cache.get(json_user_whitelist, load_whitelist_players)
+
+
+def get_debug_bot_names():
+    return config_cache.get(json_debug_bots, load_debug_bots)
+
+
+# --------------------------------------------------------------------------- #
+#                              DEATH MESSAGE PARSING
+# --------------------------------------------------------------------------- #
+
+TEMPLATE_PLACEHOLDER = re.compile(r"(<player>|<killer>|<item/block>)")
+PLACEHOLDER_PATTERNS = {
+    "<player>": r"(?P<t{}_player>\S+)",
+    "<killer>": r"(?P<t{}_killer>.+?)",
+    "<item/block>": r"(?P<t{}_item>.+?)",
+}
+
+
+class DeathEvent:
+    """Who died, the death message key (e.g. death.attack.mob), and the killer and item if named."""
+
+    __slots__ = ("player", "cause", "killer", "item")
+
+    def __init__(self, player, cause, killer=None, item=None):
+        self.player = player
+        self.cause = cause
+        self.killer = killer
+        self.item = item
+
+    def __repr__(self):
+        return f"DeathEvent({self.player!r}, {self.cause!r}, killer={self.killer!r}, item={self.item!r})"
+
+
+class DeathParser:
+    """Parse death messages into DeathEvents using the templates in deathTemplates.json.
+
+    Templates use the same `<player>`, `<killer>` and `<item/block>` forms as
+    utils/check_death_messages.py. They are compiled into one anchored
+    alternation tried longest literal text first, so "<player> was killed by
+    magic" wins over "<player> was killed by <killer>".
+    """
+
+    def __init__(self, templates):
+        ordered = sorted(
+            templates.items(), key=lambda item: (-len(TEMPLATE_PLACEHOLDER.sub("", item[1])), item[0])
+        )
+        self.templates = dict(ordered)
+        self.causes = [cause for cause, _ in ordered]
+        alternatives = []
+        for index, (_, template) in enumerate(ordered):
+            pattern = "".join(
+                PLACEHOLDER_PATTERNS[part].format(index) if part in PLACEHOLDER_PATTERNS else re.escape(part)
+                for part in TEMPLATE_PLACEHOLDER.split(template)
+            )
+            alternatives.append(f"(?P<t{index}>{pattern})")
+        self.regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def parse(self, message):
+        """Return a DeathEvent for a death message (the log line without its prefix), or None."""
+        found = self.regex.fullmatch(message.strip()) if self.regex else None
+        if not found:
+            return None
+
+        index = found.lastgroup
+        fields = found.groupdict()
+        item = fields.get(f"{index}_item")
+        if item and item.startswith("[") and item.endswith("]"):
+            item = item[1:-1]
+        return DeathEvent(fields[f"{index}_player"], self.causes[int(index[1:])], fields.get(f"{index}_killer"), item)
+
+
+# --------------------------------------------------------------------------- #
+#                              LOG FILE WATCHING
+# --------------------------------------------------------------------------- #
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+INOTIFY_EVENT = struct.Struct("iIII")
+
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+DIRECTORY_EVENTS = IN_MODIFY | IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+
+class PollingWatcher:
+    """Wake the follower on a timer, backing off while the log stays idle."""
+
+    min_delay = 0.05
+    max_delay = 0.5
+
+    def __init__(self):
+        self.delay = self.min_delay
+
+    def watch_file(self):
+        pass
+
+    def reset(self):
+        self.delay = self.min_delay
+
+    async def wait(self):
+        await asyncio.sleep(self.delay)
+        self.delay = min(self.delay * 2, self.max_delay)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Wake the follower when Linux reports a change to the log file.
+
+    The file itself is watched for writes, renames and deletion, and its
+    directory for a new file appearing under the same name, which is how
+    itzg's log rotation replaces latest.log. A periodic timeout still wakes
+    the follower in case an event was missed (e.g. on network file systems).
+    """
+
+    safety_timeout = 5.0
+
+    def __init__(self, file_path):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.file_path = os.path.abspath(file_path)
+        self.file_name = os.fsencode(os.path.basename(self.file_path))
+        self.file_wd = -1
+
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            self.dir_wd = self._add_watch(os.path.dirname(self.file_path), DIRECTORY_EVENTS)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+        self.changed = asyncio.Event()
+        asyncio.get_running_loop().add_reader(self.fd, self._on_readable)
+
+    def _add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def watch_file(self):
+        """(Re)attach the file watch to whatever inode the log path points at now."""
+        if self.file_wd >= 0:
+            self.libc.inotify_rm_watch(self.fd, self.file_wd)
+            self.file_wd = -1
+        try:
+            self.file_wd = self._add_watch(self.file_path, FILE_EVENTS)
+        except FileNotFoundError:
+            pass
+
+    def _on_readable(self):
+        try:
+            while True:
+                data = os.read(self.fd, 4096)
+                if not data:
+                    break
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = data[offset:offset + name_length].rstrip(b"\0")
+                    offset += name_length
+                    if wd == self.file_wd or name == self.file_name:
+                        self.changed.set()
+        except BlockingIOError:
+            pass
+
+    def reset(self):
+        pass
+
+    async def wait(self):
+        try:
+            await asyncio.wait_for(self.changed.wait(), self.safety_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.changed.clear()
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+def open_log_watcher(file_path):
+    """Return an inotify watcher when available, otherwise a backoff poller."""
+    if log_watcher_backend != "poll":
+        try:
+            return InotifyWatcher(file_path)
+        except (OSError, AttributeError) as e:
+            if log_watcher_backend == "inotify":
+                raise
+            print(f"inotify unavailable ({e}), falling back to polling {file_path}")
+    return PollingWatcher()
+
+
+# --------------------------------------------------------------------------- #
+#                              DISCORD WEBHOOK
+# --------------------------------------------------------------------------- #
+
+class WebhookDispatcher:
+    """Deliver the webhook outbox to Discord from one worker over a keep-alive session.
+
+    Every announcement is first stored in the webhook_outbox table together
+    with its death, and deleted once Discord accepts it, so delivery is
+    at-least-once across failures and restarts. New entries are handed over
+    directly through a bounded queue; a sweep of the table picks up whatever
+    is left at startup, what didn't fit in the queue (as soon as it has room
+    again), and deliveries that failed, which are put back with exponential
+    backoff. Entries already queued or being posted are never queued twice.
+    Embeds that arrive within the coalesce window of the first queued one are
+    sent together, up to Discord's limit of 10 per message. The worker tracks
+    the webhook's rate limit bucket from the X-RateLimit-* headers and waits
+    for it to reset instead of hitting a 429; if one happens anyway the
+    message is retried after Retry-After. Network errors and 5xx responses
+    are retried with exponential backoff. If the webhook itself is rejected
+    (401, 403, 404: a wrong URL or a deleted webhook) the entries are kept
+    and deferred until it is fixed. Any other 4xx means Discord won't accept
+    the message as it is: the embeds are posted again one at a time so only
+    the ones it rejects are dropped.
+    """
+
+    DELIVERED, REJECTED, DEFERRED = "delivered", "rejected", "deferred"
+    webhook_errors = {401, 403, 404}
+
+    max_embeds = 10
+    max_attempts = 5
+    max_queue_size = 1000
+    sweep_interval = 30
+
+    def __init__(self, url, coalesce_window):
+        self.url = url
+        self.coalesce_window = coalesce_window
+        self.queue = asyncio.Queue(self.max_queue_size)
+        self.queued_ids = set()
+        self.overflowed = False
+        self.wake = asyncio.Event()
+        self.session = None
+        self.blocked_until = 0.0
+
+    def send(self, entry):
+        """Queue an OutboxEntry for delivery; if the queue is full a later sweep delivers it."""
+        if entry.id in self.queued_ids:
+            return
+        if self.queue.full():
+            metrics.inc("humbler_webhook_overflow_total")
+            self.overflowed = True
+            return
+        self.queued_ids.add(entry.id)
+        self.queue.put_nowait(entry)
+
+    async def run(self):
+        self.session = ClientSession()
+        sweeper = asyncio.create_task(self._sweep_outbox())
+        try:
+            while True:
+                entries = await self._next_batch()
+                try:
+                    await self._deliver(entries)
+                except Exception as e:
+                    print(f"Error: {e}")
+                finally:
+                    self.queued_ids.difference_update(entry.id for entry in entries)
+                    for _ in entries:
+                        self.queue.task_done()
+                if self.overflowed and self.queue.qsize() < self.max_queue_size // 2:
+                    self.overflowed = False
+                    self.wake.set()  # Sweep up what didn't fit without waiting for sweep_interval
+        finally:
+            sweeper.cancel()
+            await self.session.close()
+
+    async def _sweep_outbox(self):
+        """Queue every outbox entry at startup, then the ones that are due every sweep_interval or when woken."""
+        due_by = float("inf")
+        while True:
+            try:
+                # Queued entries are loaded too (and skipped), so leave room past them
+                limit = len(self.queued_ids) + self.max_queue_size
+                entries = await database.read(_load_outbox, due_by, limit)
+                if entries and due_by == float("inf"):
+                    print(f"Delivering {len(entries)} webhook message(s) left in the outbox")
+                for entry in entries:
+                    self.send(entry)
+            except Exception as e:
+                print(f"Error reading the webhook outbox: {e}")
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            due_by = time.time()
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        entries = [await self.queue.get()]
+        deadline = loop.time() + self.coalesce_window
+
+        while len(entries) < self.max_embeds:
+            if not self.queue.empty():
+                entries.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                entries.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return entries
+
+    async def _deliver(self, entries):
+        """Post entries as one message and delete or defer them in the outbox.
+
+        If Discord rejects a message of several embeds, each is posted on its
+        own, so one bad embed doesn't drop the others.
+        """
+        result = await self._post({"embeds": [entry.embed for entry in entries]})
+        if result == self.REJECTED and len(entries) > 1:
+            print(f"Retrying the {len(entries)} embeds of the rejected message one at a time")
+            for entry in entries:
+                await self._deliver([entry])
+            return
+
+        entry_ids = [entry.id for entry in entries]
+        if result == self.DEFERRED:
+            metrics.inc("humbler_webhook_deferred_total", len(entries))
+            await database.write(_defer_outbox, entry_ids, time.time())
+        else:
+            if result == self.REJECTED:
+                metrics.inc("humbler_webhook_rejected_total")
+                print(f"Dropping webhook embed Discord rejected: {json.dumps(entries[0].embed)}")
+            await database.write(_delete_outbox, entry_ids)
+
+    async def _post(self, payload):
+        """Post a message, retrying transient failures; returns DELIVERED, REJECTED or DEFERRED."""
+        loop = asyncio.get_running_loop()
+        backoff = 1.0
+
+        for _ in range(self.max_attempts):
+            delay = self.blocked_until - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            started = time.perf_counter()
+            try:
+                async with self.session.post(self.url, json=payload) as response:
+                    metrics.observe("humbler_webhook_seconds", time.perf_counter() - started, status=response.status)
+                    self._update_bucket(response.headers)
+                    if response.status == 429:
+                        retry_after = await self._retry_after(response)
+                        print(f"Discord rate limited the webhook, retrying in {retry_after:.2f}s")
+                        self.blocked_until = max(self.blocked_until, loop.time() + retry_after)
+                        continue
+                    if response.status < 400:
+                        metrics.inc("humbler_webhook_embeds_total", len(payload["embeds"]))
+                        return self.DELIVERED
+                    if response.status in self.webhook_errors:
+                        print(
+                            f"Discord refused the webhook ({response.status}), check DISCORD_WEBHOOK_URL; "
+                            f"keeping the message in the outbox: {await response.text()}"
+                        )
+                        return self.DEFERRED
+                    if response.status < 500:
+                        print(f"Discord rejected the webhook message ({response.status}): {await response.text()}")
+                        return self.REJECTED
+                    print(f"Discord webhook returned {response.status}, retrying in {backoff:.0f}s")
+            except (ClientError, asyncio.TimeoutError) as e:
+                metrics.observe("humbler_webhook_seconds", time.perf_counter() - started, status="error")
+                print(f"Error posting to Discord webhook, retrying in {backoff:.0f}s: {e}")
+
+            await asyncio.sleep(backoff)
+            backoff *= 2
+
+        print(f"Giving up on Discord webhook message after {self.max_attempts} attempts, keeping it in the outbox")
+        return self.DEFERRED
+
+    def _update_bucket(self, headers):
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset_after = float(headers.get("X-RateLimit-Reset-After", 0))
+            self.blocked_until = asyncio.get_running_loop().time() + reset_after
+
+    @staticmethod
+    async def _retry_after(response):
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        try:
+            return float((await response.json()).get("retry_after", 1))
+        except (ClientError, ValueError):
+            return 1.0
+
+
+webhook_dispatcher = WebhookDispatcher(discord_webhook_url, webhook_coalesce_window)
+metrics.gauge("humbler_webhook_queue_depth", webhook_dispatcher.queue.qsize)
 
 
 # --------------------------------------------------------------------------- #
@@ -148,109 +1579,754 @@ def transform_line(line):
     return re.sub(r"^\[[\d+:]*\] \[Server thread/INFO\]: ", "", line)
 
 
-async def write_to_discord_webhook(content):
-    async with ClientSession() as session:
-        async with session.post(discord_webhook_url, json=content):
-            pass
+LOG_TIME = re.compile(r"^\[(\d{1,2}):(\d{2}):(\d{2})\]")
 
 
-async def process_log_line(line, whitelist_patterns, debug_bots):
-    """Handle a single matched log line."""
-    if "lost connection" in line.lower():
-        return  # Ignore bot disconnect messages
+def line_timestamp(line, now=None):
+    """Return the unix time a log line was written, from its [HH:MM:SS] prefix.
 
-    if line in processed_lines:
-        return
+    The log only records the time of day, so the date is taken from `now`;
+    a time more than a minute in the future must be from before midnight.
+    """
+    now = now or datetime.now()
+    found = LOG_TIME.match(line)
+    if not found:
+        return int(now.timestamp())
+
+    hour, minute, second = (int(part) for part in found.groups())
+    written = now.replace(hour=hour, minute=minute, second=second, microsecond=0)
+    if written - now > timedelta(minutes=1):
+        written -= timedelta(days=1)
+    return int(written.timestamp())
+
+
+class LogClock:
+    """Date the lines of a rotated log, read in order, from the date in its name.
+
+    Lines only carry the time of day, so the day starts as the one in the
+    archive's name (e.g. 2024-05-01-1.log.gz) and moves on whenever a time is
+    earlier than the one before it. backfill and the recovery of logs rotated
+    while humbler was down both use it, so they date a death the same way.
+    """
+
+    def __init__(self, file_path):
+        self.day = datetime.strptime(archive_sort_key(file_path)[0], "%Y-%m-%d")
+        self.previous_time = None
+
+    def timestamp(self, line):
+        """Return the unix time of the next line of the log."""
+        found = LOG_TIME.match(line)
+        if found:
+            hour, minute, second = (int(part) for part in found.groups())
+            written = self.day.replace(hour=hour, minute=minute, second=second)
+            if self.previous_time and written < self.previous_time:
+                self.day += timedelta(days=1)  # The log ran past midnight
+                written += timedelta(days=1)
+            self.previous_time = written
+        return int((self.previous_time or self.day).timestamp())
+
+
+# source is the LogSource the line was read from, filled in by the pipeline,
+# and occurred_at its unix time if the time of day in the line isn't enough
+MatchedLine = namedtuple(
+    "MatchedLine", "line transformed username phrase event source occurred_at", defaults=(None, None)
+)
+
+
+def parse_log_line(line, death_matcher, death_parser, whitelist_names, debug_bot_names):
+    """Return a MatchedLine if the line is the death of a whitelisted player or debug bot.
+
+    The line is also parsed into a DeathEvent; that is None for deaths that
+    match a phrase in deathMessages.json but none of the templates.
+    """
+    phrase = death_matcher.match(line)
+    if not phrase or "lost connection" in line.lower():
+        return None  # Not a death, or a bot disconnect message
 
     transformed_line = transform_line(line)
-    combined_patterns = whitelist_patterns + debug_bots
-
-    if any(transformed_line.lower().startswith(name.lower()) for name in combined_patterns):
-        print(f"Found matching line in log: {line.strip()}")
-        print(f"Sending to Discord: {transformed_line.strip()}")
-
-        username = transformed_line.split()[0]
-        death_count, season_count = await increment_death_count(username)
-        humbled_response_text = await load_humbled_responses()
-
-        payload = {
-            "embeds": [
-                {
-                    "type": "rich",
-                    "title": humbled_response_text.strip(),
-                    "description": (
-                        f"{transformed_line.strip()} "
-                        f"(Season {minecraft_season} Deaths: {season_count}, Total Deaths: {death_count})"
-                    ),
-                    "color": 0xb7ff00,
-                    "footer": {"text": "Brought to you by the Humbler gang."}
-                }
-            ]
-        }
+    tokens = transformed_line.split(None, 1)
+    if not tokens:
+        return None
+
+    username = tokens[0]
+    name = normalize_username(username)
+    if name not in whitelist_names and name not in debug_bot_names:
+        return None
 
-        await write_to_discord_webhook(payload)
-        processed_lines.add(line)
+    event = death_parser.parse(transformed_line)
+    return MatchedLine(line, transformed_line, username, phrase, event)
 
 
-async def follow_log():
-    """Watch and yield new lines that match death + user patterns."""
-    global last_position, last_inode, last_size, processed_lines
+def death_row(matched, server, death_season, occurred_at):
+    event = matched.event or DeathEvent(matched.username, None)
+    return DeathRow(
+        server, death_season, matched.username, occurred_at, matched.phrase,
+        event.cause, event.killer, event.item, matched.line.rstrip("\r\n"),
+    )
+
+
+def line_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class RecentLines:
+    """The most recently processed lines, kept as hashes in a fixed-size LRU."""
+
+    def __init__(self, size):
+        self.size = size
+        self.digests = OrderedDict()
+
+    def __contains__(self, line):
+        return line_digest(line.encode()) in self.digests
+
+    def add(self, line):
+        digest = line_digest(line.encode())
+        self.digests[digest] = None
+        self.digests.move_to_end(digest)
+        if len(self.digests) > self.size:
+            self.digests.popitem(last=False)
+
+
+processed_lines = RecentLines(dedupe_size)
 
-    death_messages_patterns = await load_death_messages()
-    whitelist_patterns = await load_user_whitelist()
-    debug_bots = await load_debug_bots()
 
-    while True:
+async def process_log_line(matched):
+    """Record a single matched death and queue its Discord announcement."""
+    line, transformed_line, source = matched.line, matched.transformed, matched.source
+    dedupe_key = f"{source.name}\n{line}"
+
+    if dedupe_key in processed_lines:
+        return
+
+    print(f"Found matching line in log: {line.strip()}")
+
+    humbled_response_text = get_humbled_response()
+
+    def build_embed(death_count, season_count):
+        return {
+            "type": "rich",
+            "title": humbled_response_text,
+            "description": (
+                f"{transformed_line.strip()} "
+                f"({season_label(source)} Deaths: {season_count}, Total Deaths: {death_count})"
+            ),
+            "color": 0xb7ff00,
+            "footer": {"text": "Brought to you by the Humbler gang."}
+        }
+
+    _, _, outbox_entry = await increment_death_count(matched, build_embed)
+    processed_lines.add(dedupe_key)
+    if outbox_entry is None:
+        print(f"Already recorded, not announcing again: {line.strip()}")
+        return
+
+    print(f"Sending to Discord: {transformed_line.strip()}")
+    webhook_dispatcher.send(outbox_entry)
+
+
+def filter_lines(buffer, end, line_filter):
+    """Return copies of the lines in buffer[:end] that line_filter finds a match in.
+
+    buffer[:end] is lowercased once and searched as a whole rather than line
+    by line; end must be just after a newline. Whatever is past end (the rest
+    of a partly filled buffer) is never copied.
+    """
+    lines = []
+    if not line_filter:
+        return lines
+    start = 0
+    with memoryview(buffer) as view:
+        lowered = view[:end].tobytes().lower()
+        while found := line_filter.search(lowered, start, end):
+            line_start = lowered.rfind(b"\n", 0, found.start()) + 1
+            start = lowered.find(b"\n", found.end(), end) + 1
+            lines.append(view[line_start:start].tobytes())
+    return lines
+
+
+LogChunk = namedtuple("LogChunk", "lines line_count length last_line")
+
+
+class ChunkReader:
+    """Read a log's complete lines in fixed-size chunks through one reusable buffer.
+
+    Each read fills the buffer from the given position and runs filter_lines
+    over it; only lines containing a match are copied out, so memory stays at
+    about two chunks however far behind the reader is. A partial line at the
+    end of the chunk is left for the next read, which starts at its
+    beginning. A single line longer than the buffer grows it.
+    """
+
+    def __init__(self, chunk_size):
+        self.buffer = bytearray(chunk_size)
+
+    def read(self, log_file, position, line_filter):
+        """Return a LogChunk of candidate lines after position; line_count is 0 if no line is complete yet."""
+        log_file.seek(position)
+        size = log_file.readinto(self.buffer)
+        end = self.buffer.rfind(b"\n", 0, size) + 1
+        while not end and size == len(self.buffer):
+            self.buffer.extend(bytes(len(self.buffer)))
+            with memoryview(self.buffer) as view:
+                size += log_file.readinto(view[size:])
+            end = self.buffer.rfind(b"\n", 0, size) + 1
+        if not end:
+            return LogChunk([], 0, 0, b"")
+
+        lines = filter_lines(self.buffer, end, line_filter)
+        last_line = bytes(self.buffer[self.buffer.rfind(b"\n", 0, end - 1) + 1:end])
+        return LogChunk(lines, self.buffer.count(b"\n", 0, end), end, last_line)
+
+
+def resume_position(log_file, stat, checkpoint):
+    """Return the offset to resume from after a restart, given the stored checkpoint.
+
+    If the log was rotated or rewritten while humbler was down, everything in
+    the current file is new and reading starts from the top.
+    """
+    if checkpoint.inode != stat.st_ino or checkpoint.position > stat.st_size:
+        return 0
+
+    log_file.seek(checkpoint.position - checkpoint.line_length)
+    last_processed = log_file.read(checkpoint.line_length)
+    if line_digest(last_processed).hex() != checkpoint.fingerprint:
+        return 0
+    return checkpoint.position
+
+
+# Rotations humbler can catch up on after being down: the archive holding the
+# checkpoint is looked for among this many of the newest ones
+ROTATED_LOG_SEARCH = 8
+
+
+def find_rotated_logs(log_file_path, checkpoint):
+    """Find the archives a checkpointed log was rotated into while humbler was down.
+
+    itzg's rotation gzips latest.log into e.g. 2024-05-01-1.log.gz next to it.
+    Returns [(path, position to read from)]: the newest archive holding the
+    checkpointed line at its offset, from just after that line, then every
+    archive rotated after it from the start. Empty if no archive holds it.
+    """
+    log_dir = os.path.dirname(os.path.abspath(log_file_path))
+    archives = sorted(glob.glob(os.path.join(log_dir, "*.log.gz")), key=archive_sort_key)
+    for index in range(len(archives) - 1, max(len(archives) - ROTATED_LOG_SEARCH, 0) - 1, -1):
         try:
-            stat = os.stat(log_file_path)
-            current_inode, current_size = stat.st_ino, stat.st_size
+            with gzip.open(archives[index], "rb") as archive:
+                archive.seek(checkpoint.position - checkpoint.line_length)
+                last_processed = archive.read(checkpoint.line_length)
+        except (OSError, EOFError):
+            continue
+        if line_digest(last_processed).hex() == checkpoint.fingerprint:
+            return [(archives[index], checkpoint.position)] + [(path, 0) for path in archives[index + 1:]]
+    return []
+
+
+def read_rotated_log(source, archive_path, position):
+    """Yield LogBatches of the candidate lines after position in a rotated log.
+
+    Lines are dated with a LogClock run over the whole archive, which backfill
+    does too, so a death recovered here is not added again by a backfill of
+    the same archive. Checkpoints point into the archive, where
+    find_rotated_logs() picks up again if humbler stops half way through.
+    """
+    clock = LogClock(archive_path)
+    line_filter = get_death_matcher().line_filter
+    lines, times, line_count, offset, batch_start = [], [], 0, 0, position
+    with gzip.open(archive_path, "rb") as archive:
+        inode = os.fstat(archive.fileno()).st_ino
+        for line in archive:
+            occurred_at = clock.timestamp(line.decode("utf-8", errors="replace"))
+            offset += len(line)
+            if offset <= position or not line.endswith(b"\n"):
+                continue
+            line_count += 1
+            if line_filter and line_filter.search(line.lower()):
+                lines.append(line)
+                times.append(occurred_at)
+            if offset - batch_start >= read_chunk_size:
+                metrics.inc("humbler_log_lines_total", line_count, server=source.name)
+                yield LogBatch(source, lines, Checkpoint(inode, offset, len(line), line_digest(line).hex()), times)
+                lines, times, line_count, batch_start = [], [], 0, offset
+        if line_count:
+            metrics.inc("humbler_log_lines_total", line_count, server=source.name)
+            yield LogBatch(source, lines, Checkpoint(inode, offset, len(line), line_digest(line).hex()), times)
+
+
+async def save_checkpoint(source, checkpoint):
+    await database.write(_save_checkpoint, source.log_file_path, checkpoint)
+
+
+# checkpoint is None for streamed logs, which can't be resumed. times holds
+# each line's unix time when it is known from elsewhere than the time of day
+# in the line, as for rotated logs.
+LogBatch = namedtuple("LogBatch", "source lines checkpoint times", defaults=(None,))
+
+STREAM_LOCATION = re.compile(r"(fifo|unix):(.+)")
+
+
+def follow_log(source):
+    """Return an async iterator of LogBatches from wherever a source's log comes from.
+
+    log_file is normally the path of latest.log, which follow_file() tails.
+    It can also be a stream: "-" for standard input (e.g. piped from
+    `docker logs -f`), "fifo:/path" for a named pipe, or "unix:/path" for a
+    Unix socket to listen on. Streams are read as data arrives, with no
+    polling, seeking or checkpoints.
+    """
+    location = source.log_file_path
+    stream = STREAM_LOCATION.fullmatch(location)
+    if location == "-":
+        return follow_stdin(source)
+    if stream and stream.group(1) == "fifo":
+        return follow_fifo(source, stream.group(2))
+    if stream:
+        return follow_unix_socket(source, stream.group(2))
+    return follow_file(source)
+
+
+async def follow_file(source):
+    """Watch one server's log file and yield a LogBatch of raw lines each time new ones are written.
+
+    Each batch carries the checkpoint for the end of its last line, to be
+    saved once everything before it has been processed. The read position
+    is local to each call, so any number of logs can be followed at once.
+    When the log is rotated, the old file is read to the end through the
+    handle still open on it before switching to the new one, so lines
+    written just before the rename are not lost. On startup, logs rotated
+    while humbler was down are read from the checkpoint on before latest.log.
+    """
+    log_file_path = source.log_file_path
+    last_position = last_inode = 0
+    reader = ChunkReader(read_chunk_size)
+
+    def read_batches(log_file):
+        """Yield a LogBatch for each chunk of complete lines after last_position, up to the end of log_file."""
+        nonlocal last_position
+        while (chunk := reader.read(log_file, last_position, get_death_matcher().line_filter)).line_count:
+            metrics.inc("humbler_log_lines_total", chunk.line_count, server=source.name)
+            last_position += chunk.length
+            last_line = chunk.last_line
+            yield LogBatch(
+                source, chunk.lines,
+                Checkpoint(last_inode, last_position, len(last_line), line_digest(last_line).hex()),
+            )
 
-            # Handle rotation/truncation
-            if last_inode != current_inode or last_size > current_size:
-                last_position, last_inode, last_size = current_size, current_inode, current_size
-                processed_lines.clear()
-                await asyncio.sleep(1)
+    checkpoint = await database.read(_load_checkpoint, log_file_path)
+    watcher = open_log_watcher(log_file_path)
+    log_file = None
+    first_open = True
 
-            async with aiofiles.open(log_file_path, "r") as log_file:
-                await log_file.seek(last_position)
-                lines = await log_file.readlines()
+    try:
+        while True:
+            try:
+                stat = os.stat(log_file_path)
+                if log_file is not None and last_inode != stat.st_ino:
+                    for batch in read_batches(log_file):
+                        yield batch
+
+                # Handle startup, rotation and truncation
+                if log_file is None or last_inode != stat.st_ino or last_position > stat.st_size:
+                    if log_file is not None:
+                        log_file.close()
+                        log_file = None
+                    log_file = open(log_file_path, "rb")
+                    stat = os.fstat(log_file.fileno())
+
+                    if first_open:
+                        if checkpoint:
+                            last_position = resume_position(log_file, stat, checkpoint)
+                            rotated = [] if last_position else find_rotated_logs(log_file_path, checkpoint)
+                            for archive_path, position in rotated:
+                                # Finish the logs rotated while humbler was down first, oldest first
+                                print(f"{log_file_path} was rotated to {archive_path}, reading it from byte {position}")
+                                for batch in read_rotated_log(source, archive_path, position):
+                                    yield batch
+                            print(f"Resuming {log_file_path} at byte {last_position}")
+                        else:
+                            last_position = stat.st_size
+                    elif last_inode != stat.st_ino or last_position > stat.st_size:
+                        print(f"{log_file_path} was rotated or truncated, reading it from the start")
+                        last_position = 0
+
+                    first_open = False
+                    last_inode = stat.st_ino
+                    watcher.watch_file()
+
+                read_any = False
+                for batch in read_batches(log_file):
+                    read_any = True
+                    yield batch
+                if read_any:
+                    watcher.reset()
+                else:
+                    await watcher.wait()
+
+            except FileNotFoundError:
+                if log_file is not None:
+                    # Moved away and not replaced yet; finish what was written to it first
+                    for batch in read_batches(log_file):
+                        yield batch
+                    log_file.close()
+                    log_file = None
+                elif first_open and not checkpoint:
+                    first_open = False  # Nothing to resume, so read the new file from the start
+                watcher.watch_file()
+                await asyncio.sleep(1)
 
-                if not lines:
-                    await asyncio.sleep(0.1)
-                    continue
+            except Exception as e:
+                print(f"Error: {e}")
+                await asyncio.sleep(1)
+    finally:
+        if log_file is not None:
+            log_file.close()
+        watcher.close()
+
+
+async def read_stream(source, reader):
+    """Yield a LogBatch of candidate lines for every read of complete lines from a StreamReader, until EOF."""
+    pending = bytearray()
+    while chunk := await reader.read(read_chunk_size):
+        pending += chunk
+        end = pending.rfind(b"\n") + 1
+        if not end:
+            continue
+        metrics.inc("humbler_log_lines_total", pending.count(b"\n", 0, end), server=source.name)
+        lines = filter_lines(pending, end, get_death_matcher().line_filter)
+        del pending[:end]
+        yield LogBatch(source, lines, None)
+
+
+async def open_pipe_reader(pipe):
+    reader = asyncio.StreamReader()
+    transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    return reader, transport
+
+
+async def follow_stdin(source):
+    """Yield LogBatches from standard input until it is closed.
+
+    Input redirected from a file (`< latest.log`) can't be watched like a
+    pipe, so it is read through a ChunkReader up to its end instead.
+    """
+    if S_ISREG(os.fstat(sys.stdin.fileno()).st_mode):
+        print(f"Reading {source.name} log from the file on standard input")
+        reader = ChunkReader(read_chunk_size)
+        with open(sys.stdin.fileno(), "rb", closefd=False) as log_file:
+            position = log_file.tell()
+            while (chunk := reader.read(log_file, position, get_death_matcher().line_filter)).line_count:
+                metrics.inc("humbler_log_lines_total", chunk.line_count, server=source.name)
+                position += chunk.length
+                yield LogBatch(source, chunk.lines, None)
+        print(f"Reached the end of standard input, stopped reading {source.name} log")
+        return
 
-                for line in lines:
-                    if "lost connection" in line.lower():
-                        continue
+    reader, transport = await open_pipe_reader(sys.stdin.buffer)
+    print(f"Reading {source.name} log from standard input")
+    try:
+        async for batch in read_stream(source, reader):
+            yield batch
+        print(f"Standard input closed, stopped reading {source.name} log")
+    finally:
+        transport.close()
+
+
+async def follow_fifo(source, path):
+    """Yield LogBatches from a named pipe, creating it if needed; writers can come and go."""
+    if not os.path.exists(path):
+        os.mkfifo(path)
+    elif not S_ISFIFO(os.stat(path).st_mode):
+        raise ValueError(f"{path} is not a named pipe")
+
+    # Also opened for writing so the pipe never reports EOF when a writer exits
+    pipe = os.fdopen(os.open(path, os.O_RDWR | os.O_NONBLOCK), "rb", buffering=0)
+    reader, transport = await open_pipe_reader(pipe)
+    print(f"Reading {source.name} log from named pipe {path}")
+    try:
+        async for batch in read_stream(source, reader):
+            yield batch
+    finally:
+        transport.close()
 
-                    if (
-                        any(re.search(pattern, line, re.IGNORECASE) for pattern in death_messages_patterns)
-                        and any(re.search(pattern, line, re.IGNORECASE) for pattern in whitelist_patterns + debug_bots)
-                    ):
-                        yield line
 
-                last_position = await log_file.tell()
-                last_size = current_size
+async def follow_unix_socket(source, path):
+    """Listen on a Unix socket and yield LogBatches from every connection to it."""
+    if os.path.exists(path):
+        if not S_ISSOCK(os.stat(path).st_mode):
+            raise ValueError(f"{path} exists and is not a socket")
+        os.unlink(path)  # Left behind by a previous run
 
-        except FileNotFoundError:
-            last_position = 0
-            processed_lines.clear()
-            await asyncio.sleep(1)
+    batches = asyncio.Queue(pipeline_queue_size)
+    writers = set()
 
+    async def handle_connection(reader, writer):
+        writers.add(writer)
+        print(f"{source.name} log stream connected on {path}")
+        try:
+            async for batch in read_stream(source, reader):
+                await batches.put(batch)
         except Exception as e:
-            print(f"Error: {e}")
-            await asyncio.sleep(1)
+            print(f"Error reading {source.name} log stream: {e}")
+        finally:
+            writers.discard(writer)
+            writer.close()
+        print(f"{source.name} log stream on {path} disconnected")
+
+    server = await asyncio.start_unix_server(handle_connection, path)
+    print(f"Listening for {source.name} log on {path}")
+    try:
+        while True:
+            yield await batches.get()
+    finally:
+        server.close()
+        for writer in writers:
+            writer.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# --------------------------------------------------------------------------- #
+#                              PROCESSING PIPELINE
+# --------------------------------------------------------------------------- #
 
+# Stages run as separate tasks connected by bounded queues:
+#
+#   read (follow_log) -> match -> persist (SQLite) -> notify (webhook_dispatcher)
+#
+# There is one reader per log source; the other stages are shared by all of
+# them. read and match block when the next queue is full; the log file on
+# disk is the buffer, so pausing reads loses nothing (a stream's writer is
+# paused instead). persist submits every death waiting in its queue at once
+# so the database thread commits them in one transaction, and never waits on
+# Discord: every embed is written to the webhook outbox with its death, and
+# one that does not fit in the notify queue waits there for the dispatcher's
+# next sweep. None is passed down the queues to drain on shutdown, or once
+# every source is a stream that has ended.
+
+async def read_stage(source, batches):
+    async for batch in follow_log(source):
+        await batches.put(batch)
+
+
+async def match_stage(batches, deaths):
+    while (batch := await batches.get()) is not None:
+        death_matcher = get_death_matcher()
+        death_parser = get_death_parser()
+        whitelist_names = get_whitelist_names()
+        debug_bot_names = get_debug_bot_names()
+
+        started = time.perf_counter()
+        matches = []
+        for index, raw_line in enumerate(batch.lines):
+            matched = parse_log_line(
+                raw_line.decode("utf-8", errors="replace"), death_matcher, death_parser, whitelist_names, debug_bot_names
+            )
+            if matched:
+                matches.append(matched._replace(source=batch.source, occurred_at=batch.times and batch.times[index]))
+        metrics.observe("humbler_match_seconds", time.perf_counter() - started)
+        metrics.inc("humbler_deaths_matched_total", len(matches))
 
-async def log_processor():
-    initialize_database()
-    async for line in follow_log():
-        if line.strip():
+        for matched in matches:
             if debug:
-                print(f"Debug: Matched line - {line.strip()}")
-            whitelist_patterns = await load_user_whitelist()
-            debug_bots = await load_debug_bots()
-            await process_log_line(line, whitelist_patterns, debug_bots)
+                print(f"Debug: Matched line - {matched.line.strip()}")
+            await deaths.put(matched)
+        await deaths.put(batch._replace(lines=()))  # Checkpoint once the deaths before it are stored
+
+    await deaths.put(None)
+
+
+# Times a death is tried before giving up on it for this run
+PERSIST_ATTEMPTS = 3
+
+
+async def record_deaths(matches):
+    """Record matched deaths, retrying failures a few times; returns the ones that still failed."""
+    for attempt in range(PERSIST_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(attempt)
+        results = await asyncio.gather(*(process_log_line(matched) for matched in matches), return_exceptions=True)
+        failed = []
+        for matched, result in zip(matches, results):
+            if isinstance(result, Exception):
+                print(f"Error processing {matched.line.strip()}: {result}")
+                failed.append(matched)
+        if not failed:
+            break
+        matches = failed
+    return failed
+
+
+async def persist_stage(deaths):
+    pending_checkpoints = {}
+    saved_at = time.monotonic()
+    draining = False
+    # Sources with a death that couldn't be recorded: their read position is
+    # no longer saved, so the death is read (and retried) again after a restart
+    held_sources = set()
+
+    while not draining:
+        items = [await deaths.get()]
+        while not deaths.empty():
+            items.append(deaths.get_nowait())
+
+        draining = None in items
+        matches = [item for item in items if isinstance(item, MatchedLine)]
+        checkpoints = [item for item in items if isinstance(item, LogBatch)]
+
+        for matched in await record_deaths(matches):
+            if matched.source not in held_sources:
+                held_sources.add(matched.source)
+                print(
+                    f"Not saving the read position of {matched.source.name} past deaths that couldn't be "
+                    f"recorded; they will be read again after a restart"
+                )
+
+        for batch in checkpoints:
+            if batch.checkpoint is not None and batch.source not in held_sources:
+                pending_checkpoints[batch.source] = batch.checkpoint
+        if pending_checkpoints and (matches or draining or time.monotonic() - saved_at >= checkpoint_interval):
+            for source, checkpoint in pending_checkpoints.items():
+                await save_checkpoint(source, checkpoint)
+            pending_checkpoints.clear()
+            saved_at = time.monotonic()
+
+
+async def run_pipeline():
+    """Run the log processing stages until cancelled or every log source ends, then drain what was already read."""
+    get_death_matcher()  # Fail fast on a broken deathMessages.json
+    get_death_parser()
+
+    batches = asyncio.Queue(pipeline_queue_size)
+    deaths = asyncio.Queue(pipeline_queue_size)
+    metrics.gauge("humbler_pipeline_queue_depth", batches.qsize, queue="batches")
+    metrics.gauge("humbler_pipeline_queue_depth", deaths.qsize, queue="deaths")
+
+    readers = [asyncio.create_task(read_stage(source, batches)) for source in log_sources]
+    matcher = asyncio.create_task(match_stage(batches, deaths))
+    persister = asyncio.create_task(persist_stage(deaths))
+    notifier = asyncio.create_task(webhook_dispatcher.run())
+    tasks = [*readers, matcher, persister, notifier]
+
+    async def drain():
+        await batches.put(None)
+        try:
+            await asyncio.wait_for(asyncio.gather(matcher, persister), shutdown_timeout)
+            await asyncio.wait_for(webhook_dispatcher.queue.join(), shutdown_timeout)
+        except asyncio.TimeoutError:
+            print(f"Gave up draining the log pipeline after {shutdown_timeout:.0f}s")
+
+    try:
+        running = set(tasks)
+        while not all(reader.done() for reader in readers):
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # Re-raise whatever stopped a stage
+        print("Every log source has ended, draining log pipeline...")
+        await drain()
+    except asyncio.CancelledError:
+        print("Draining log pipeline...")
+        for reader in readers:
+            reader.cancel()
+        await asyncio.wait(readers)
+        await drain()
+        raise
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# --------------------------------------------------------------------------- #
+#                              BACKFILL
+# --------------------------------------------------------------------------- #
+
+ARCHIVE_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})-(\d+)\.log\.gz$")
+
+backfill_matcher = None
+backfill_target = None
+
+
+def archive_sort_key(file_path):
+    """Order rotated logs by the date and sequence number in their name, e.g. 2024-05-01-2.log.gz."""
+    found = ARCHIVE_NAME.search(os.path.basename(file_path))
+    if found:
+        return found.group(1), int(found.group(2)), file_path
+    modified = datetime.fromtimestamp(os.path.getmtime(file_path))
+    return modified.strftime("%Y-%m-%d"), 0, file_path
+
+
+def init_backfill_worker(death_matcher, death_parser, whitelist_names, debug_bot_names, server, backfill_season):
+    global backfill_matcher, backfill_target
+    backfill_matcher = (death_matcher, death_parser, whitelist_names, debug_bot_names)
+    backfill_target = (server, backfill_season)
+
+
+def scan_archive(file_path):
+    """Decompress one rotated log and return the deaths in it as rows for death_events."""
+    clock = LogClock(file_path)
+    deaths = []
+
+    with gzip.open(file_path, "rt", encoding="utf-8", errors="replace") as archive:
+        for line in archive:
+            occurred_at = clock.timestamp(line)
+            matched = parse_log_line(line, *backfill_matcher)
+            if matched:
+                deaths.append(death_row(matched, *backfill_target, occurred_at))
+
+    return deaths
+
+
+def backfill(file_paths, source, backfill_season, workers):
+    """Load deaths from rotated .log.gz archives into the database without posting to Discord.
+
+    Archives are decompressed and matched in a process pool and stored in
+    name order, one transaction per archive. Deaths already in the database
+    (for example from the live follower) are skipped, so it is safe to rerun.
+    """
+    if not file_paths and (source.log_file_path == "-" or STREAM_LOCATION.fullmatch(source.log_file_path)):
+        print(f"{source.name} is read from a stream, name the .log.gz archives to backfill")
+        return
+    if not file_paths:
+        file_paths = glob.glob(os.path.join(os.path.dirname(os.path.abspath(source.log_file_path)), "*.log.gz"))
+    file_paths = sorted(file_paths, key=archive_sort_key)
+    if not file_paths:
+        print("No .log.gz archives found to backfill")
+        return
+
+    conn = sqlite3.connect(db_file_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    initialize_database(conn)
+    conn.execute("COMMIT")
+
+    matcher_args = (
+        get_death_matcher(), get_death_parser(), get_whitelist_names(), get_debug_bot_names(), source.name, backfill_season
+    )
+    started = time.perf_counter()
+    total_found = total_added = 0
+
+    with ProcessPoolExecutor(workers, initializer=init_backfill_worker, initargs=matcher_args) as pool:
+        for file_path, deaths in zip(file_paths, pool.map(scan_archive, file_paths)):
+            conn.execute("BEGIN IMMEDIATE")
+            added = _store_backfilled_deaths(conn, deaths)
+            conn.execute("COMMIT")
+            total_found += len(deaths)
+            total_added += added
+            print(f"{os.path.basename(file_path)}: {len(deaths)} death(s), {added} new")
+
+    if total_added:
+        # Backfilled deaths are older than the ones already counted, so replay the season in order
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_death_stats(conn, source.name, backfill_season)
+        conn.execute("COMMIT")
+    conn.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Backfilled {len(file_paths)} archive(s) into {season_label(source._replace(season=backfill_season))} "
+        f"in {elapsed:.2f}s: "
+        f"{total_found} death(s) found, {total_added} new"
+    )
 
 
 # --------------------------------------------------------------------------- #
@@ -258,11 +2334,21 @@ async def log_processor():
 # --------------------------------------------------------------------------- #
 
 async def init_discord_bot():
+    if headless:
+        print("Running headless, slash commands are disabled")
+        return
+
     discord_token = os.getenv("DISCORD_TOKEN")
     if not discord_token:
         print("Error: DISCORD_TOKEN environment variable not set")
         return
 
+    # Imported here rather than at the top: discord.py is most of humbler's
+    # startup time and memory, and only the slash commands need it.
+    import discord
+    from discord import app_commands
+    from discord.ext import commands
+
     intents = discord.Intents.default()
     intents.message_content = True
     bot = commands.Bot(command_prefix="!", intents=intents)
@@ -278,50 +2364,181 @@ async def init_discord_bot():
         except Exception as e:
             print(f"Failed to sync commands: {e}")
 
-    async def load_whitelist_players():
-        """Load player names from the whitelist JSON file."""
-        if not json_user_whitelist or not os.path.exists(json_user_whitelist):
-            print(f"⚠️  Whitelist file not found: {json_user_whitelist}")
-            return []
-        try:
-            async with aiofiles.open(json_user_whitelist, "r") as f:
-                data = json.loads(await f.read())
-                return [entry.get("name", "") for entry in data if "name" in entry]
-        except Exception as e:
-            print(f"⚠️  Error loading whitelist: {e}")
-            return []
+    server_description = f"Which Minecraft server (default: {default_source.name})"
+
+    async def server_autocomplete(interaction: discord.Interaction, current: str):
+        return [
+            app_commands.Choice(name=source.name, value=source.name)
+            for source in log_sources if current.lower() in source.name.lower()
+        ][:25]
+
+    async def resolve_server(interaction, server):
+        """Return the LogSource a command asked for, or None after telling the user it doesn't exist."""
+        source = find_log_source(server)
+        if source is None:
+            names = ", ".join(source.name for source in log_sources)
+            await interaction.response.send_message(f"Unknown server {server}. Try one of: {names}", ephemeral=True)
+        return source
 
     @humbler_group.command(name="deaths", description="Check a player's death count for the current season")
-    @app_commands.describe(player_name="The Minecraft username to look up")
-    async def deaths_subcommand(interaction: discord.Interaction, player_name: str):
-        death_count = await get_death_count(player_name)
+    @app_commands.describe(player_name="The Minecraft username to look up", server=server_description)
+    async def deaths_subcommand(interaction: discord.Interaction, player_name: str, server: str = None):
+        source = await resolve_server(interaction, server)
+        if source is None:
+            return
+        death_count = await get_death_count(source, player_name)
         await interaction.response.send_message(
-            f"{player_name} has died {death_count} time(s) in Season {minecraft_season}"
+            f"{player_name} has died {death_count} time(s) in {season_label(source)}"
         )
 
+    deaths_subcommand.autocomplete("server")(server_autocomplete)
+
     @deaths_subcommand.autocomplete("player_name")
     async def deaths_autocomplete(interaction: discord.Interaction, current: str):
-        """Autocomplete Minecraft usernames from the whitelist file."""
-        players = await load_whitelist_players()
-        if not current:
-            return [app_commands.Choice(name=p, value=p) for p in players[:25]]
-        matches = [p for p in players if current.lower() in p.lower()]
-        return [app_commands.Choice(name=p, value=p) for p in matches[:25]]
+        """Autocomplete Minecraft usernames from the whitelist and the death records."""
+        return [app_commands.Choice(name=p, value=p) for p in player_names.search(current)]
+
+    def scoreboard_embed(source, page):
+        leaderboard = leaderboards[source.name]
+        lines = [
+            f"{rank}. **{username}**: {deaths} deaths"
+            for rank, username, deaths in leaderboard.page(page, scoreboard_page_size)
+        ]
+        embed = discord.Embed(
+            title=f"{season_label(source)} Humbler Scoreboard",
+            description="\n".join(lines),
+            color=0xb7ff00,
+        )
+        embed.set_footer(text=f"Page {page + 1}/{leaderboard.page_count(scoreboard_page_size)}")
+        return embed
+
+    class ScoreboardView(discord.ui.View):
+        """Previous/next buttons that flip through the scoreboard pages."""
+
+        def __init__(self, source):
+            super().__init__(timeout=300)
+            self.source = source
+            self.page = 0
+            self.update_buttons()
+
+        def update_buttons(self):
+            page_count = leaderboards[self.source.name].page_count(scoreboard_page_size)
+            self.page = min(self.page, page_count - 1)
+            self.previous_page.disabled = self.page == 0
+            self.next_page.disabled = self.page >= page_count - 1
+
+        async def show_page(self, interaction, page):
+            self.page = max(0, page)
+            self.update_buttons()
+            await interaction.response.edit_message(embed=scoreboard_embed(self.source, self.page), view=self)
+
+        @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+        async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self.show_page(interaction, self.page - 1)
+
+        @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+        async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self.show_page(interaction, self.page + 1)
 
     @humbler_group.command(name="scoreboard", description="Display the death scoreboard for the current season")
-    async def scoreboard_subcommand(interaction: discord.Interaction):
-        scoreboard = await get_scoreboard()
-        if not scoreboard:
+    @app_commands.describe(server=server_description)
+    async def scoreboard_subcommand(interaction: discord.Interaction, server: str = None):
+        source = await resolve_server(interaction, server)
+        if source is None:
+            return
+        if not leaderboards[source.name].page(0, scoreboard_page_size):
             await interaction.response.send_message("The scoreboard is empty! No one has been humbled yet.")
             return
 
-        response = f"Season {minecraft_season} Humbler Scoreboard\n"
-        for i, (username, deaths) in enumerate(scoreboard, 1):
-            response += f"{i}. **{username}**: {deaths} deaths\n"
+        view = ScoreboardView(source)
+        await interaction.response.send_message(embed=scoreboard_embed(source, 0), view=view)
+
+    scoreboard_subcommand.autocomplete("server")(server_autocomplete)
+
+    @humbler_group.command(name="top", description="Show the most common causes, killers or weapons this season")
+    @app_commands.describe(category="What to rank deaths by", server=server_description)
+    @app_commands.choices(category=[
+        app_commands.Choice(name=category, value=category) for category in DEATH_DETAIL_COLUMNS
+    ])
+    async def top_subcommand(interaction: discord.Interaction, category: str, server: str = None):
+        source = await resolve_server(interaction, server)
+        if source is None:
+            return
+        rows = await get_top_details(source, category)
+        if not rows:
+            await interaction.response.send_message(f"No {category} recorded yet in {season_label(source)}.")
+            return
+
+        templates = get_death_parser().templates
+        lines = [
+            f"{rank}. **{templates.get(value, value) if category == 'causes' else value}**: {deaths} deaths"
+            for rank, (value, deaths) in enumerate(rows, 1)
+        ]
+        embed = discord.Embed(
+            title=f"{season_label(source)} top {category}",
+            description="\n".join(lines),
+            color=0xb7ff00,
+        )
+        await interaction.response.send_message(embed=embed)
+
+    top_subcommand.autocomplete("server")(server_autocomplete)
+
+    def format_duration(seconds):
+        days, seconds = divmod(int(seconds), 86400)
+        hours, seconds = divmod(seconds, 3600)
+        minutes = seconds // 60
+        if days:
+            return f"{days}d {hours}h"
+        if hours:
+            return f"{hours}h {minutes}m"
+        return f"{minutes}m"
+
+    @humbler_group.command(name="stats", description="Show a player's recent deaths and survival streaks this season")
+    @app_commands.describe(player_name="The Minecraft username to look up", server=server_description)
+    async def stats_subcommand(interaction: discord.Interaction, player_name: str, server: str = None):
+        source = await resolve_server(interaction, server)
+        if source is None:
+            return
+        stats = await get_death_stats(source, player_name)
+        if stats is None:
+            await interaction.response.send_message(f"{player_name} hasn't died in {season_label(source)} yet.")
+            return
+
+        embed = discord.Embed(title=f"{player_name} in {season_label(source)}", color=0xb7ff00)
+        embed.add_field(name="Deaths this season", value=str(stats.season_deaths))
+        embed.add_field(name="Last hour", value=str(stats.last_hour))
+        embed.add_field(name="Last 24 hours", value=str(stats.last_day))
+        if stats.last_death_at is None:
+            embed.set_footer(text="No death times recorded yet, so there are no streaks to show.")
+            await interaction.response.send_message(embed=embed)
+            return
 
-        await interaction.response.send_message(response)
+        # The current streak counts as the longest once it passes the best finished one
+        surviving = max(0, int(time.time()) - stats.last_death_at)
+        if surviving > stats.best_streak:
+            longest = f"{format_duration(surviving)} (ongoing)"
+        elif stats.best_streak_ended_at:
+            longest = f"{format_duration(stats.best_streak)} (ended <t:{stats.best_streak_ended_at}:d>)"
+        else:
+            longest = format_duration(stats.best_streak)
+
+        embed.add_field(name="Alive for", value=f"{format_duration(surviving)} (since <t:{stats.last_death_at}:R>)")
+        embed.add_field(name="Longest survival streak", value=longest)
+        embed.add_field(
+            name="Deadliest day", value=f"<t:{stats.deadliest_day}:D>: {stats.deadliest_day_deaths} deaths"
+        )
+        await interaction.response.send_message(embed=embed)
 
-    await bot.start(discord_token)
+    stats_subcommand.autocomplete("server")(server_autocomplete)
+    stats_subcommand.autocomplete("player_name")(deaths_autocomplete)
+
+    try:
+        await bot.start(discord_token)
+    except Exception as e:
+        print(f"Discord bot stopped, deaths are still posted to the webhook: {e}")
+    finally:
+        if not bot.is_closed():
+            await bot.close()
 
 
 # --------------------------------------------------------------------------- #
@@ -329,15 +2546,55 @@ async def init_discord_bot():
 # --------------------------------------------------------------------------- #
 
 async def main():
-    await asyncio.gather(
-        log_processor(),
-        init_discord_bot()
+    database.start()
+    try:
+        await database.write(initialize_database)
+        await load_leaderboard()
+        pipeline = asyncio.create_task(run_pipeline())
+        services = asyncio.gather(serve_metrics(), init_discord_bot())
+        try:
+            await asyncio.wait([pipeline, services], return_when=asyncio.FIRST_COMPLETED)
+            if services.done():
+                services.result()  # Re-raise a metrics server or bot setup failure
+            await pipeline  # Runs until shutdown, unless every log source is a stream that ends
+        finally:
+            pipeline.cancel()
+            services.cancel()
+            await asyncio.gather(pipeline, services, return_exceptions=True)
+    finally:
+        await asyncio.to_thread(database.close)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Announce Minecraft deaths on Discord and keep score.")
+    subparsers = parser.add_subparsers(dest="command")
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="Load deaths from rotated .log.gz archives without posting to Discord"
+    )
+    backfill_parser.add_argument(
+        "archives", nargs="*", help="Archives to load (default: every *.log.gz next to the server's log file)"
+    )
+    backfill_parser.add_argument(
+        "--server", default=default_source.name, choices=[source.name for source in log_sources],
+        help="Log source the archives belong to (default: the first one)"
+    )
+    backfill_parser.add_argument(
+        "-s", "--season", type=int, help="Season to record the deaths in (default: the server's current season)"
+    )
+    backfill_parser.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes"
     )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        if args.command == "backfill":
+            source = find_log_source(args.server)
+            backfill(args.archives, source, source.season if args.season is None else args.season, args.workers)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("Script terminated")
 
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import gzip
+import time
+import random
+import signal
+import asyncio
+import argparse
+import resource
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+# Paths relative to this script
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPT_DIR)
+HUMBLER_PATH = os.path.join(REPO_DIR, "humbler.py")
+DEFAULT_JSON_PATH = os.path.join(REPO_DIR, "deathMessages.json")
+
+SCENARIOS = ["steady", "backlog", "mass_death", "rotation", "startup_headless", "startup_bot", "pipe", "fifo", "unix"]
+
+# A stream is read once with no checkpoint to resume from, so a death it
+# doesn't post is lost for good: the run fails instead of just warning
+POST_EVERY_DEATH = {"pipe", "fifo", "unix"}
+STREAM_SCENARIOS = {"pipe", "fifo", "unix"}
+
+PLAYERS = [f"Player{i}" for i in range(24)]
+NOISE_LINES = [
+    "<{player}> anyone want to go to the end tonight?",
+    "<{player}> lol",
+    "<{player}> brb getting food",
+    "{player} joined the game",
+    "{player} left the game",
+    "{player} has made the advancement [Stone Age]",
+    "{player} lost connection: Disconnected",
+    "Saving the game (this may take a moment!)",
+    "Saved the game",
+    "[Rcon: Saved the game]",
+    "Can't keep up! Is the server overloaded? Running 2041ms or 40 ticks behind",
+    "ThreadedAnvilChunkStorage: All dimensions are saved",
+]
+DEATH_ID = re.compile(r"#(\d+)")
+
+GREEN = "\033[92m"
+RED = "\033[91m"
+CYAN = "\033[96m"
+RESET = "\033[0m"
+
+if not sys.stdout.isatty():
+    GREEN = RED = CYAN = RESET = ""
+
+
+class LogGenerator:
+    """Produce itzg-style latest.log lines with a configurable share of deaths.
+
+    Death lines cycle through every phrase in deathMessages.json and end in a
+    unique "#<id>" so the webhook stub can tell which death a post is for.
+    """
+
+    def __init__(self, phrases, death_ratio, seed=0):
+        self.phrases = phrases
+        self.death_ratio = death_ratio
+        self.random = random.Random(seed)
+        self.next_id = 0
+
+    def death(self, when=None):
+        death_id = self.next_id
+        self.next_id += 1
+        player = self.random.choice(PLAYERS)
+        phrase = self.phrases[death_id % len(self.phrases)]
+        return self._format(when, f"{player} {phrase} Zombie #{death_id}"), death_id
+
+    def noise(self, when=None):
+        template = self.random.choice(NOISE_LINES)
+        return self._format(when, template.format(player=self.random.choice(PLAYERS)))
+
+    def line(self, when=None):
+        """Return (line, death id or None)."""
+        if self.random.random() < self.death_ratio:
+            return self.death(when)
+        return self.noise(when), None
+
+    @staticmethod
+    def _format(when, message):
+        when = when or datetime.now()
+        return f"[{when:%H:%M:%S}] [Server thread/INFO]: {message}\n"
+
+
+def load_phrases(json_path):
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("deathMessages", [])
+
+
+def generate(args):
+    """Write a synthetic latest.log plus rotated YYYY-MM-DD-N.log.gz archives."""
+    generator = LogGenerator(load_phrases(args.json), args.death_ratio, args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    when = datetime(2024, 1, 1, 12, 0, 0)
+    archive = 0
+    written = 0
+
+    while written < args.lines:
+        chunk = min(args.rotate_every or args.lines, args.lines - written)
+        last_chunk = written + chunk >= args.lines
+        if last_chunk:
+            path = os.path.join(args.output, "latest.log")
+            opener = open
+        else:
+            archive += 1
+            path = os.path.join(args.output, f"{when:%Y-%m-%d}-{archive}.log.gz")
+            opener = gzip.open
+
+        with opener(path, "wt", encoding="utf-8") as f:
+            for _ in range(chunk):
+                when += timedelta(seconds=1)
+                f.write(generator.line(when)[0])
+        written += chunk
+        print(f"Wrote {chunk} lines to {path}")
+
+    print(f"{GREEN}Generated {written} lines with {generator.next_id} deaths in {args.output}{RESET}")
+
+
+class WebhookStub:
+    """Local stand-in for the Discord webhook that records when each death arrives."""
+
+    def __init__(self):
+        self.arrivals = {}
+        self.requests = 0
+        self.runner = None
+
+    async def handle(self, request):
+        payload = await request.json()
+        now = time.time()
+        self.requests += 1
+        for embed in payload.get("embeds", []):
+            for death_id in DEATH_ID.findall(embed.get("description", "")):
+                self.arrivals.setdefault(int(death_id), now)
+        return web.Response(status=204)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/webhook", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}/webhook"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class LogWriter:
+    """Append generated lines to latest.log (or a pipe), remembering when each death was written."""
+
+    def __init__(self, log_path, generator, stream=None):
+        self.log_path = log_path
+        self.generator = generator
+        self.stream = stream
+        self.written_at = {}
+        self.lines = 0
+        self.rotations = 0
+
+    def write(self, lines):
+        if self.stream:
+            self.stream.write("".join(line for line, _ in lines).encode("utf-8"))
+        else:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.writelines(line for line, _ in lines)
+        now = time.time()
+        for _, death_id in lines:
+            if death_id is not None:
+                self.written_at[death_id] = now
+        self.lines += len(lines)
+
+    def rotate(self):
+        self.rotations += 1
+        os.rename(self.log_path, f"{self.log_path}.{self.rotations}")
+        open(self.log_path, "w").close()
+
+
+def write_config(workdir, webhook_url, args):
+    logs_dir = os.path.join(workdir, "logs")
+    os.makedirs(logs_dir)
+    log_path = os.path.join(logs_dir, "latest.log")
+    open(log_path, "w").close()
+
+    whitelist_path = os.path.join(workdir, "whitelist.json")
+    with open(whitelist_path, "w", encoding="utf-8") as f:
+        json.dump([{"uuid": str(i), "name": player} for i, player in enumerate(PLAYERS)], f)
+
+    env = dict(os.environ)
+    env.update({
+        "MINECRAFT_SEASON": "1",
+        "DISCORD_WEBHOOK_URL": webhook_url,
+        "JSON_DEATH_MESSAGES": args.json,
+        "JSON_USER_WHITELIST": whitelist_path,
+        "JSON_DEBUG_BOTS": os.path.join(REPO_DIR, "debugBots.json"),
+        "JSON_HUMBLED_RESPONSES": os.path.join(REPO_DIR, "humbledResponses.json"),
+        "LOG_FILE_PATH": log_path,
+        "DB_FILE_PATH": os.path.join(workdir, "deaths.db"),
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.pop("DISCORD_TOKEN", None)
+    env.pop("METRICS_PORT", None)
+    return log_path, env
+
+
+def process_stats(pid):
+    """Return (cpu seconds, peak RSS in MB) of a running process from /proc, or None."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            peak = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+        return cpu, peak / 1024
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def wait_for(condition, timeout, interval=0.05):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(interval)
+    return condition()
+
+
+async def open_stream(name, path, timeout):
+    """Connect to the named pipe or Unix socket humbler reads from, once it is listening; returns a StreamWriter."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if name == "unix":
+                return (await asyncio.open_unix_connection(path))[1]
+            # Non-blocking, so this fails with ENXIO until humbler has the pipe open for reading
+            pipe = os.fdopen(os.open(path, os.O_WRONLY | os.O_NONBLOCK), "wb", buffering=0)
+            loop = asyncio.get_running_loop()
+            transport, protocol = await loop.connect_write_pipe(
+                lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), pipe
+            )
+            return asyncio.StreamWriter(transport, protocol, None, loop)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def run_scenario(name, args):
+    stub = WebhookStub()
+    webhook_url = await stub.start()
+    generator = LogGenerator(load_phrases(args.json), args.death_ratio, args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="humbler-bench-") as workdir:
+        log_path, env = write_config(workdir, webhook_url, args)
+        if name == "startup_headless":
+            env["HEADLESS"] = "1"
+        elif name == "startup_bot":
+            # Loads discord.py and the slash commands; the login itself fails and humbler carries on
+            env["DISCORD_TOKEN"] = "benchmark"
+        elif name == "pipe":
+            # The backlog again, piped to humbler's stdin as `docker logs -f` would be
+            env["LOG_FILE_PATH"] = "-"
+        elif name == "fifo" or name == "unix":
+            # The backlog again, through a named pipe or a Unix socket connection
+            stream_path = os.path.join(workdir, f"latest.{name}")
+            if name == "fifo":
+                os.mkfifo(stream_path)
+            env["LOG_FILE_PATH"] = f"{name}:{stream_path}"
+
+        launched = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, HUMBLER_PATH, env=env,
+            stdin=asyncio.subprocess.PIPE if name == "pipe" else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        stream = None
+        if name == "pipe":
+            stream = process.stdin
+        elif name == "fifo" or name == "unix":
+            stream = await open_stream(name, stream_path, args.timeout)
+        writer = LogWriter(log_path, generator, stream)
+
+        # Keep writing a death until one is posted, so timing starts once humbler is tailing
+        warmup = set()
+        ready = False
+        while not ready and time.monotonic() - launched < args.timeout:
+            line, death_id = generator.death()
+            warmup.add(death_id)
+            writer.write([(line, death_id)])
+            ready = await wait_for(lambda: stub.arrivals.keys() & warmup, 0.1)
+        startup_seconds = time.monotonic() - launched
+        await asyncio.sleep(args.settle)
+
+        started = time.time()
+        if name == "steady" or name == "rotation":
+            batches = int(args.duration * 10)
+            for batch in range(batches):
+                writer.write([generator.line() for _ in range(max(1, args.rate // 10))])
+                if name == "rotation" and batch and batch % 20 == 0:
+                    # A death as the old file's last line, renamed away before humbler can have read it
+                    writer.write([generator.death()])
+                    writer.rotate()
+                await asyncio.sleep(0.1)
+        elif name == "backlog" or name in STREAM_SCENARIOS:
+            lines = [generator.line() for _ in range(args.lines - 1)]
+            lines.append(generator.death())
+            writer.write(lines)
+            if writer.stream:
+                await writer.stream.drain()
+        elif name == "mass_death":
+            for _ in range(args.rounds):
+                now = datetime.now()
+                writer.write([(generator.noise(now), None)] + [
+                    generator.death(now) for _ in range(args.deaths_per_round)
+                ])
+                await asyncio.sleep(2)
+
+        expected = set(writer.written_at) - warmup
+        await wait_for(lambda: expected <= stub.arrivals.keys(), args.timeout)
+        finished = max((stub.arrivals[d] for d in expected if d in stub.arrivals), default=time.time())
+
+        usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        stats = process_stats(process.pid)
+        process.send_signal(signal.SIGINT)
+        await process.wait()
+        if writer.stream:
+            writer.stream.close()
+        usage_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    await stub.stop()
+
+    latencies = [(stub.arrivals[d] - writer.written_at[d]) * 1000 for d in expected if d in stub.arrivals]
+    if stats:
+        cpu_seconds, max_rss_mb = stats
+    else:
+        cpu_seconds = (usage_after.ru_utime + usage_after.ru_stime) - (usage_before.ru_utime + usage_before.ru_stime)
+        max_rss_mb = usage_after.ru_maxrss / 1024
+
+    elapsed = max(finished - started, 1e-9)
+    return {
+        "scenario": name,
+        "lines_written": writer.lines,
+        "deaths_written": len(expected),
+        "deaths_posted": len(latencies),
+        "webhook_requests": stub.requests,
+        "rotations": writer.rotations,
+        "elapsed_seconds": round(elapsed, 3),
+        "lines_per_second": round(writer.lines / elapsed, 1),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) and round(percentile(latencies, 0.50), 2),
+            "p99": percentile(latencies, 0.99) and round(percentile(latencies, 0.99), 2),
+            "max": latencies and round(max(latencies), 2) or None,
+        },
+        "startup_seconds": round(startup_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "max_rss_mb": round(max_rss_mb, 1),
+    }
+
+
+def flatten(result, prefix=""):
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if not previous:
+            continue
+        print(f"\n{CYAN}{result['scenario']} vs {baseline_path}{RESET}")
+        old = flatten(previous)
+        for key, value in flatten(result).items():
+            if key in old and old[key]:
+                change = (value - old[key]) / old[key] * 100
+                print(f"  {key}: {old[key]} -> {value} ({change:+.1f}%)")
+
+
+def bench(args):
+    results = []
+    failed = []
+    for name in args.scenarios:
+        print(f"{CYAN}Running scenario '{name}'...{RESET}", file=sys.stderr)
+        result = asyncio.run(run_scenario(name, args))
+        if result["deaths_posted"] < result["deaths_written"]:
+            print(f"{RED}Only {result['deaths_posted']}/{result['deaths_written']} deaths were posted{RESET}",
+                  file=sys.stderr)
+            if name in POST_EVERY_DEATH:
+                failed.append(name)
+        results.append(result)
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"{GREEN}Wrote results to {args.output}{RESET}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if failed:
+        print(f"{RED}Deaths were lost in: {', '.join(failed)}{RESET}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark humbler against a synthetic log and a local webhook.")
+    parser.add_argument("-j", "--json", default=DEFAULT_JSON_PATH, help="Path to deathMessages.json")
+    parser.add_argument("--death-ratio", type=float, default=0.01, help="Share of generated lines that are deaths")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated log")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Write a synthetic latest.log and rotated archives")
+    generate_parser.add_argument("output", help="Directory to write the logs to")
+    generate_parser.add_argument("-n", "--lines", type=int, default=100000, help="Total number of lines")
+    generate_parser.add_argument("--rotate-every", type=int, default=0, help="Lines per rotated .log.gz archive")
+
+    bench_parser = subparsers.add_parser("run", help="Run benchmark scenarios and report JSON results")
+    bench_parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                              help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    bench_parser.add_argument("-o", "--output", help="Write the JSON results to this file")
+    bench_parser.add_argument("-c", "--compare", help="Previous JSON results to compare against")
+    bench_parser.add_argument("--rate", type=int, default=500, help="Lines per second for steady/rotation")
+    bench_parser.add_argument("--duration", type=float, default=10, help="Seconds to run steady/rotation")
+    bench_parser.add_argument("--lines", type=int, default=200000,
+                              help="Lines written at once for backlog and the streams")
+    bench_parser.add_argument("--rounds", type=int, default=5, help="Mass death rounds")
+    bench_parser.add_argument("--deaths-per-round", type=int, default=8, help="Deaths in each mass death round")
+    bench_parser.add_argument("--settle", type=float, default=1.0, help="Seconds to wait after warm-up")
+    bench_parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for deaths to be posted")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        unknown = [name for name in args.scenarios if name not in SCENARIOS]
+        if unknown:
+            parser.error(f"unknown scenario(s): {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+        args.scenarios = args.scenarios or SCENARIOS
+
+    if args.command == "generate":
+        generate(args)
+    else:
+        bench(args)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 import os
 import re
 import json
+import time
 import urllib.request
 import sys
 import argparse
@@ -11,6 +12,22 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_JSON_PATH = os.path.join(os.path.dirname(SCRIPT_DIR), "deathMessages.json")
 WIKI_URL = "https://minecraft.wiki/w/Death_messages"
 
+# The matcher humbler.py uses, so the artifact is built and timed with the same code
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+from death_matcher import MATCHER_ARTIFACT_VERSION, DeathMatcher, build_anchors, minimize_patterns, phrases_digest
+
+# Typical non-death lines, which are most of a real log, for the match cost estimate
+NOISE_LINES = [
+    "[12:00:00] [Server thread/INFO]: Steve joined the game",
+    "[12:00:01] [Server thread/INFO]: Steve left the game",
+    "[12:00:02] [Server thread/INFO]: <Steve> anyone want to go to the nether?",
+    "[12:00:03] [Server thread/INFO]: Steve has made the advancement [Stone Age]",
+    "[12:00:04] [Server thread/INFO]: Steve lost connection: Disconnected",
+    "[12:00:05] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 2041ms or 40 ticks behind",
+    "[12:00:06] [Server thread/INFO]: Saving the game (this may take a moment!)",
+    "[12:00:07] [User Authenticator #1/INFO]: UUID of player Steve is 069a79f4-44e9-4726-a5be-fca90e38aaf5",
+]
+
 GREEN = "\033[92m"
 RED = "\033[91m"
 YELLOW = "\033[93m"
@@ -70,6 +87,12 @@ def extract_messages(html_content):
         if is_msg and len(cleaned) < 200:
             death_messages.append(cleaned)
 
+    return death_messages
+
+def load_templates(templates_path):
+    with open(templates_path, "r", encoding="utf-8") as f:
+        return list(json.load(f).get("deathTemplates", {}).values())
+
 def normalize_msg(msg):
     msg = msg.replace('%1$s', '<player>')
     msg = msg.replace('%2$s', '<killer>')
@@ -95,11 +118,15 @@ def generate_candidate(msg):
     candidate = candidate.strip(" .,!?'\"()[]{}")
     return ' '.join(candidate.split()).strip()
 
-def is_matched(msg, patterns):
+def instantiate_msg(msg):
     instantiated = msg
     instantiated = instantiated.replace('<player>', 'Steve')
     instantiated = instantiated.replace('<killer>', 'Zombie')
     instantiated = instantiated.replace('<item/block>', 'Sword')
+    return instantiated
+
+def is_matched(msg, patterns):
+    instantiated = instantiate_msg(msg)
 
     for pattern in patterns:
         try:
@@ -110,52 +137,96 @@ def is_matched(msg, patterns):
                 return True, pattern
     return False, None
 
-def main():
-    parser = argparse.ArgumentParser(description="Check deathMessages.json against the Minecraft Wiki.")
-    parser.add_argument("-j", "--json", default=DEFAULT_JSON_PATH, help="Path to deathMessages.json")
-    parser.add_argument("-f", "--file", help="Path to a locally saved HTML file of the Minecraft Wiki Death Messages page")
-    parser.add_argument("-w", "--write", action="store_true", help="Automatically write/add missing patterns to the json file")
-    args = parser.parse_args()
-
-    if not os.path.exists(args.json):
-        print(f"{RED}Error: JSON file not found at {args.json}{RESET}")
+def covered_messages(messages, phrases):
+    """Messages (with placeholders filled in) that humbler.py would match with these phrases."""
+    return {m for m in messages if any(p in instantiate_msg(m).lower() for p in phrases)}
+
+def build_trie_pattern(phrases):
+    """Compile phrases into one regex that shares common prefixes ("was b(?:lown|urned)...").
+
+    Each phrase ends in an empty group named after its index, so the match's
+    lastgroup tells humbler.py which phrase was found, as with the plain
+    alternation. This needs no phrase to be a prefix of another, which
+    minimize_patterns() guarantees.
+    """
+    trie = {}
+    for index, phrase in enumerate(phrases):
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = index
+
+    def build(node):
+        branches = [
+            f"(?P<p{child}>)" if char == "" else re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+        ]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie) if trie else ""
+
+def match_cost(matcher, lines, rounds=200):
+    """Average nanoseconds for a DeathMatcher to check one of these lines."""
+    best = float("inf")
+    for _ in range(7):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for line in lines:
+                matcher.match(line)
+        best = min(best, time.perf_counter() - started)
+    return best / (rounds * len(lines)) * 1e9
+
+def optimize(patterns, messages, artifact_path):
+    kept, removed = minimize_patterns(patterns)
+    print(f"\n{CYAN}Optimizing {len(patterns)} patterns...{RESET}")
+    for phrase, covering in sorted(removed.items()):
+        print(f"- \"{phrase}\" is already covered by \"{covering}\"")
+
+    before = covered_messages(messages, [p.lower() for p in patterns if p])
+    after = covered_messages(messages, kept)
+    if before != after:
+        print(f"{RED}Error: the optimized patterns no longer match {len(before - after)} message(s), not writing the matcher:{RESET}")
+        for msg in sorted(before - after):
+            print(f"- {msg}")
         sys.exit(1)
+    print(f"Coverage unchanged: {len(after)}/{len(messages)} death messages matched.")
+
+    unused = [p for p in kept if not covered_messages(messages, [p])]
+    if unused:
+        print(f"{YELLOW}These patterns match none of the {len(messages)} death messages (kept anyway): {', '.join(unused)}{RESET}")
+
+    deaths = [instantiate_msg(m) for m in messages]
+    lines = deaths + NOISE_LINES
+    old_matcher = DeathMatcher(patterns)
+    artifact = {
+        "version": MATCHER_ARTIFACT_VERSION,
+        "source_digest": phrases_digest(patterns),
+        "phrases": kept,
+        "anchors": build_anchors(kept),
+        "pattern": build_trie_pattern(kept),
+    }
+    # The anchor pre-filter only pays off while the regex is expensive; keep it if it still helps
+    unanchored = DeathMatcher.from_artifact({**artifact, "anchors": []})
+    if match_cost(DeathMatcher.from_artifact(artifact), lines) >= match_cost(unanchored, lines):
+        artifact["anchors"] = []
+    matcher = DeathMatcher.from_artifact(artifact)
+    with open(artifact_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+        f.write("\n")
+
+    for label, sample in (("death line", deaths), ("non-death line", NOISE_LINES), ("line (mixed)", lines)):
+        old_cost = match_cost(old_matcher, sample)
+        new_cost = match_cost(matcher, sample)
+        print(f"Match cost per {label}: {old_cost:.0f}ns -> {new_cost:.0f}ns ({(1 - new_cost / old_cost) * 100:.0f}% saved)")
+
+    print(
+        f"\n{GREEN}Wrote {artifact_path} ({len(kept)} patterns, down from {len(patterns)}; "
+        f"anchor pre-filter {'kept' if artifact['anchors'] else 'dropped'}).{RESET}"
+    )
+    print("humbler.py loads it in place of compiling deathMessages.json while the JSON file is unchanged.")
 
-    with open(args.json, "r", encoding="utf-8") as f:
-        try:
-            json_data = json.load(f)
-        except Exception as e:
-            print(f"{RED}Error parsing JSON file: {e}{RESET}")
-            sys.exit(1)
-
-    patterns = json_data.get("deathMessages", [])
-    print(f"Loaded {len(patterns)} patterns from {args.json}")
-
-    if args.file:
-        if not os.path.exists(args.file):
-            print(f"{RED}Error: Local HTML file not found at {args.file}{RESET}")
-            sys.exit(1)
-        print(f"{CYAN}Reading local HTML file: {args.file}{RESET}")
-        with open(args.file, "r", encoding="utf-8") as f:
-            html_content = f.read()
-    else:
-        html_content = fetch_wiki_content()
-
-    raw_messages = extract_messages(html_content)
-
-    normalized_messages = sorted(list(set(normalize_msg(m) for m in raw_messages)))
-    print(f"Found {len(normalized_messages)} unique death messages in the HTML source.")
-
-    unmatched = []
-    for msg in normalized_messages:
-        matched, _ = is_matched(msg, patterns)
-        if not matched:
-            unmatched.append(msg)
-
-    if not unmatched:
-        print(f"\n{GREEN}All {len(normalized_messages)} Minecraft death messages are fully covered by your JSON file!{RESET}")
-        sys.exit(0)
-
+def report_unmatched(args, json_data, patterns, unmatched):
+    """Print suggested patterns for unmatched messages and add them with --write; returns the patterns in use."""
     print(f"\n{YELLOW}Found {len(unmatched)} unmatched death messages:{RESET}")
     suggested_additions = set()
     for u in unmatched:
@@ -195,9 +266,65 @@ def main():
             f.write("\n")
 
         print(f"\n{GREEN}Successfully updated {args.json}! (Added/optimized patterns, total is now {len(new_patterns)}){RESET}")
+        return new_patterns
     else:
         print(f"\n{CYAN}To automatically update the JSON file, run this script with the --write (or -w) flag:{RESET}")
         print(f"python3 {os.path.relpath(sys.argv[0])} --write")
+    return patterns
+
+def main():
+    parser = argparse.ArgumentParser(description="Check deathMessages.json against the Minecraft Wiki.")
+    parser.add_argument("-j", "--json", default=DEFAULT_JSON_PATH, help="Path to deathMessages.json")
+    parser.add_argument("-f", "--file", help="Path to a locally saved HTML file of the Minecraft Wiki Death Messages page")
+    parser.add_argument("-t", "--templates", help="Check against a deathTemplates.json instead of the Minecraft Wiki")
+    parser.add_argument("-w", "--write", action="store_true", help="Automatically write/add missing patterns to the json file")
+    parser.add_argument("-o", "--optimize", action="store_true", help="Drop redundant patterns and write a precompiled matcher for humbler.py")
+    parser.add_argument("--artifact", help="Where to write the matcher (default: deathMessages.matcher.json next to the JSON file)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.json):
+        print(f"{RED}Error: JSON file not found at {args.json}{RESET}")
+        sys.exit(1)
+
+    with open(args.json, "r", encoding="utf-8") as f:
+        try:
+            json_data = json.load(f)
+        except Exception as e:
+            print(f"{RED}Error parsing JSON file: {e}{RESET}")
+            sys.exit(1)
+
+    patterns = json_data.get("deathMessages", [])
+    print(f"Loaded {len(patterns)} patterns from {args.json}")
+
+    if args.templates:
+        print(f"{CYAN}Reading death message templates: {args.templates}{RESET}")
+        raw_messages = load_templates(args.templates)
+    elif args.file:
+        if not os.path.exists(args.file):
+            print(f"{RED}Error: Local HTML file not found at {args.file}{RESET}")
+            sys.exit(1)
+        print(f"{CYAN}Reading local HTML file: {args.file}{RESET}")
+        with open(args.file, "r", encoding="utf-8") as f:
+            raw_messages = extract_messages(f.read())
+    else:
+        raw_messages = extract_messages(fetch_wiki_content())
+
+    normalized_messages = sorted(list(set(normalize_msg(m) for m in raw_messages)))
+    print(f"Found {len(normalized_messages)} unique death messages.")
+
+    unmatched = []
+    for msg in normalized_messages:
+        matched, _ = is_matched(msg, patterns)
+        if not matched:
+            unmatched.append(msg)
+
+    if not unmatched:
+        print(f"\n{GREEN}All {len(normalized_messages)} Minecraft death messages are fully covered by your JSON file!{RESET}")
+    else:
+        patterns = report_unmatched(args, json_data, patterns, unmatched)
+
+    if args.optimize:
+        optimize(patterns, normalized_messages, args.artifact or os.path.splitext(args.json)[0] + ".matcher.json")
 
 if __name__ == "__main__":
     main()
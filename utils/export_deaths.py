@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import os
+import csv
+import json
+import time
+import sqlite3
+import sys
+import argparse
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(SCRIPT_DIR, "..", "deaths.db")
+FORMATS = ("csv", "jsonl", "parquet")
+COLUMNS = ["id", "server", "season", "username", "occurred_at", "cause", "cause_key", "killer", "item", "raw_line"]
+# Per-player season totals, which also hold the deaths counted before the event
+# log existed (migrated from the old season_N columns), with no time or details
+COUNT_COLUMNS = ["server", "season", "username", "deaths"]
+
+
+def parse_time(value):
+    """Parse a --since/--until value (2024-05-01 or 2024-05-01T18:30) as local time into a unix timestamp."""
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a date or date and time: {value!r}")
+
+
+def scope_conditions(args):
+    """Return the WHERE conditions and parameters for the chosen server and season."""
+    conditions, params = [], []
+    if args.server is not None:
+        conditions.append("server = ?")
+        params.append(args.server)
+    if args.season is not None:
+        conditions.append("season = ?")
+        params.append(args.season)
+    return conditions, params
+
+
+def build_query(args):
+    """Return the death_events (or with --counts, season_deaths) query and its parameters for the chosen scope."""
+    conditions, params = scope_conditions(args)
+    if args.counts:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT {', '.join(COUNT_COLUMNS)} FROM season_deaths {where} ORDER BY server, season, username", params
+    if args.since is not None:
+        conditions.append("occurred_at >= ?")
+        params.append(args.since)
+    if args.until is not None:
+        conditions.append("occurred_at < ?")
+        params.append(args.until)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {', '.join(COLUMNS)} FROM death_events {where} ORDER BY id", params
+
+
+def iso_time(occurred_at):
+    return datetime.fromtimestamp(occurred_at).astimezone().isoformat()
+
+
+def missing_events(cursor, args, exported):
+    """Return how many deaths season_deaths counts in the exported scope beyond the exported events."""
+    conditions, params = scope_conditions(args)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f"SELECT COALESCE(SUM(deaths), 0) FROM season_deaths {where}", params)
+    return cursor.fetchone()[0] - exported
+
+
+class CsvWriter:
+    def __init__(self, output, columns):
+        self.writer = csv.writer(output)
+        self.writer.writerow(columns)
+        self.time_index = columns.index("occurred_at") if "occurred_at" in columns else None
+
+    def write(self, rows):
+        if self.time_index is None:
+            self.writer.writerows(rows)
+            return
+        index = self.time_index
+        self.writer.writerows((*row[:index], iso_time(row[index]), *row[index + 1:]) for row in rows)
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter:
+    def __init__(self, output, columns):
+        self.output = output
+        self.columns = columns
+
+    def write(self, rows):
+        for row in rows:
+            death = dict(zip(self.columns, row))
+            if "occurred_at" in death:
+                death["occurred_at"] = iso_time(death["occurred_at"])
+            self.output.write(json.dumps(death) + "\n")
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """Write each batch as its own row group, so only one batch is ever held in memory."""
+
+    def __init__(self, output_path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("Parquet export needs pyarrow: pip install pyarrow", file=sys.stderr)
+            sys.exit(1)
+
+        self.pa = pa
+        types = {
+            "id": pa.int64(),
+            "season": pa.int32(),
+            "occurred_at": pa.timestamp("s", tz="UTC"),
+            "deaths": pa.int64(),
+        }
+        self.schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        self.writer = pq.ParquetWriter(output_path, self.schema)
+
+    def write(self, rows):
+        columns = [list(column) for column in zip(*rows)]
+        self.writer.write_batch(self.pa.record_batch(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export(args):
+    # Read-only, and the whole export runs in one read transaction: with the
+    # WAL journal humbler uses, that is a consistent snapshot of the database
+    # which neither waits for nor blocks humbler's writes.
+    conn = sqlite3.connect(f"file:{os.path.abspath(args.db)}?mode=ro", uri=True, isolation_level=None)
+    conn.execute("BEGIN")
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'death_events'")
+    if not cursor.fetchone():
+        print("Table 'death_events' not found. Start humbler.py once to migrate the database first.", file=sys.stderr)
+        sys.exit(1)
+
+    columns = COUNT_COLUMNS if args.counts else COLUMNS
+    output = None
+    if args.format == "parquet":
+        writer = ParquetWriter(args.output, columns)
+    else:
+        output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        writer = CsvWriter(output, columns) if args.format == "csv" else JsonLinesWriter(output, columns)
+
+    started = time.perf_counter()
+    exported = 0
+    query, params = build_query(args)
+    cursor.execute(query, params)
+    try:
+        # SQLite steps the query as rows are fetched, so memory stays at one batch
+        while rows := cursor.fetchmany(args.batch_size):
+            writer.write(rows)
+            exported += len(rows)
+        # Only comparable without a date range; deaths from before the event log have no date
+        missing = 0
+        if not args.counts and args.since is None and args.until is None:
+            missing = missing_events(cursor, args, exported)
+    finally:
+        writer.close()
+        if output is not None and output is not sys.stdout:
+            output.close()
+        conn.execute("COMMIT")
+        conn.close()
+
+    destination = args.output or "standard output"
+    exported_label = f"{exported} player season count(s)" if args.counts else f"{exported} death(s)"
+    print(
+        f"Exported {exported_label} to {destination} as {args.format} in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+    if missing > 0:
+        print(
+            f"Warning: {missing} more death(s) in this scope were counted before deaths were logged one by one "
+            f"(no time or details), so they aren't in the export; use --counts to export per-player totals",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the death history from deaths.db for offline analysis.")
+    parser.add_argument("-o", "--output", help="File to write (default: standard output; required for parquet)")
+    parser.add_argument("-f", "--format", choices=FORMATS,
+                        help="Output format (default: from the output file's extension, otherwise csv)")
+    parser.add_argument("--db", default=DB_PATH, help="Path to deaths.db")
+    parser.add_argument("--server", help="Only deaths on this server")
+    parser.add_argument("-s", "--season", type=int, help="Only deaths in this season")
+    parser.add_argument("--since", type=parse_time, help="Only deaths at or after this local date/time, e.g. 2024-05-01")
+    parser.add_argument("--until", type=parse_time, help="Only deaths before this local date/time")
+    parser.add_argument("--counts", action="store_true",
+                        help="Export each player's death count per season instead of single deaths, "
+                             "including deaths counted before they were logged one by one")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows fetched and written at a time")
+    args = parser.parse_args()
+
+    if args.format is None:
+        extension = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+        args.format = extension if extension in FORMATS else "csv"
+    if args.format == "parquet" and not args.output:
+        parser.error("parquet needs an --output file")
+    if args.counts and (args.since is not None or args.until is not None):
+        parser.error("--counts can't be combined with --since/--until, the counts have no dates")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    try:
+        export(args)
+    except BrokenPipeError:
+        # The reader of standard output (e.g. head) stopped early
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,38 +5,50 @@ import os
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "..", "deaths.db")
-TABLE_NAME = "deaths"
-
-def reset_seasonal(season_number: int):
-    column_name = f"season_{season_number}"
+TABLE_NAME = "season_deaths"
+EVENTS_TABLE_NAME = "death_events"
+STATS_TABLE_NAMES = ("death_buckets", "death_streaks")
 
+def reset_seasonal(season_number: int, server: str = None):
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    cursor.execute(f"PRAGMA table_info({TABLE_NAME});")
-    columns = [col[1] for col in cursor.fetchall()]
-    if column_name not in columns:
-        print(f"Column '{column_name}' not found in table '{TABLE_NAME}'.")
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE_NAME,))
+    if not cursor.fetchone():
+        print(f"Table '{TABLE_NAME}' not found. Start humbler.py once to migrate the database first.")
         conn.close()
         sys.exit(1)
 
-    update_query = f"""
-        UPDATE {TABLE_NAME}
-        SET death_count = death_count - {column_name},
-            {column_name} = 0;
-    """
-    cursor.execute(update_query)
+    # Every table's indexes lead with server, so delete one (server, season) at
+    # a time to use them rather than scanning whole tables for the season.
+    # Totals are summed from season_deaths, so nothing else needs adjusting.
+    if server is not None:
+        servers = [server]
+    else:
+        cursor.execute(f"SELECT DISTINCT server FROM {TABLE_NAME}")
+        servers = [row[0] for row in cursor.fetchall()]
+
+    players = events = 0
+    for server_name in servers:
+        params = (server_name, season_number)
+        cursor.execute(f"DELETE FROM {TABLE_NAME} WHERE server = ? AND season = ?", params)
+        players += cursor.rowcount
+        cursor.execute(f"DELETE FROM {EVENTS_TABLE_NAME} WHERE server = ? AND season = ?", params)
+        events += cursor.rowcount
+        for stats_table in STATS_TABLE_NAMES:
+            cursor.execute(f"DELETE FROM {stats_table} WHERE server = ? AND season = ?", params)
     conn.commit()
 
-    print(f"Successfully reset '{column_name}' to 0 and adjusted 'death_count' accordingly.")
+    scope = f"season {season_number}" + (f" on {server}" if server is not None else "")
+    print(f"Successfully reset {scope} ({players} player(s), {events} death event(s) removed).")
 
     conn.close()
 
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python reset_seasonal.py <season_number>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python reset_seasonal.py <season_number> [server_name]")
         sys.exit(1)
 
     try:
@@ -45,5 +57,4 @@ if __name__ == "__main__":
         print("The argument must be a number (e.g. 7).")
         sys.exit(1)
 
-    reset_seasonal(season_num)
-
+    reset_seasonal(season_num, sys.argv[2] if len(sys.argv) == 3 else None)